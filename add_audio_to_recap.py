@@ -2,15 +2,19 @@
 """
 Add Audio to Recap Video
 ========================
-Lee los videos mensuales, mide su duración, extrae fragmentos de cada MP3
-correspondiente, los une con crossfade y los pega al video final.
+Lee los videos mensuales, mide su duración y, en una sola llamada a ffmpeg,
+recorta un fragmento de cada MP3 correspondiente, los une con crossfade y
+los pega al video final.
 """
 
 import os
+import atexit
 import subprocess
 import json
-from pathlib import Path
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import config
+from config import MONTH_NAMES
 
 # Configuración
 OUTPUT_FOLDER = "output"
@@ -35,38 +39,106 @@ MONTH_AUDIO_PATTERNS = {
 }
 
 
-def find_audio_file(pattern: str, folder: str) -> str:
-    """Buscar archivo de audio que contenga el patrón"""
-    import glob
-    for f in os.listdir(folder):
-        if pattern.lower() in f.lower() and f.endswith('.mp3'):
-            return os.path.join(folder, f)
-    return None
+def build_audio_index(folder: str) -> dict:
+    """
+    Recorrer la carpeta de audio una sola vez y asociar cada patrón de mes
+    con el primer MP3 que lo contenga.
+    
+    Returns:
+        Dict {patrón: ruta al MP3}
+    """
+    index = {}
+    if not os.path.isdir(folder):
+        return index
+    
+    patterns = set(MONTH_AUDIO_PATTERNS.values())
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            name = entry.name.lower()
+            if not name.endswith('.mp3'):
+                continue
+            for pattern in patterns:
+                if pattern not in index and pattern in name:
+                    index[pattern] = entry.path
+    
+    return index
+
+
+def load_duration_cache(cache_file: str) -> dict:
+    """Cargar duraciones cacheadas de ejecuciones anteriores"""
+    if not os.path.exists(cache_file):
+        return {}
+    
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_duration_cache():
+    """Guardar duraciones cacheadas (se ejecuta al salir; archivo temporal + rename, atómico)"""
+    if not _DURATION_CACHE_DIRTY:
+        return
+    
+    cache_dir = os.path.dirname(os.path.abspath(config.DURATION_CACHE_JSON))
+    tmp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=cache_dir,
+                                         suffix='.tmp', delete=False) as f:
+            tmp_path = f.name
+            json.dump(_DURATION_CACHE, f)
+        os.replace(tmp_path, config.DURATION_CACHE_JSON)
+    except OSError as e:
+        print(f"  ⚠️ No se pudo guardar la caché de duraciones: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# Caché persistente de duraciones: "ruta|mtime_ns|tamaño" -> segundos
+_DURATION_CACHE = load_duration_cache(config.DURATION_CACHE_JSON)
+_DURATION_CACHE_DIRTY = False
+atexit.register(save_duration_cache)
 
 
 def get_duration(filepath: str) -> float:
-    """Obtener duración de un archivo multimedia en segundos"""
+    """Obtener duración de un archivo multimedia en segundos (cacheada por mtime/tamaño)"""
+    global _DURATION_CACHE_DIRTY
+    
+    st = os.stat(filepath)
+    key = f"{os.path.abspath(filepath)}|{st.st_mtime_ns}|{st.st_size}"
+    if key in _DURATION_CACHE:
+        return _DURATION_CACHE[key]
+    
     cmd = [
-        "ffprobe", "-v", "quiet",
+        "ffprobe", "-v", "error",
         "-show_entries", "format=duration",
         "-of", "json",
         filepath
     ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
     data = json.loads(result.stdout)
-    return float(data['format']['duration'])
+    duration = float(data['format']['duration'])
+    
+    _DURATION_CACHE[key] = duration
+    _DURATION_CACHE_DIRTY = True
+    return duration
 
 
-def extract_audio_segment(input_audio: str, output_audio: str, duration: float, 
-                          crossfade_compensation: float = 0):
+def build_segment_input(input_audio: str, duration: float,
+                        crossfade_compensation: float = 0) -> list:
     """
-    Extraer un segmento de audio de la duración especificada desde un punto aleatorio.
+    Elegir un punto aleatorio del audio y construir las opciones de entrada
+    de ffmpeg que leen sólo ese segmento.
     
     Args:
         input_audio: Archivo de audio fuente
-        output_audio: Archivo de salida
         duration: Duración deseada del segmento
         crossfade_compensation: Segundos extra para compensar el crossfade
+        
+    Returns:
+        Lista de argumentos de ffmpeg para esta entrada
     """
     import random
     
@@ -82,96 +154,50 @@ def extract_audio_segment(input_audio: str, output_audio: str, duration: float,
     if audio_duration >= extract_duration:
         max_start = audio_duration - extract_duration
         start_time = random.uniform(0, max_start)
+        print(f"  ✓ Segmento: {extract_duration:.1f}s (desde {start_time:.1f}s)")
         
-        cmd = [
-            "ffmpeg", "-y",
-            "-ss", str(start_time),  # Punto de inicio aleatorio
-            "-i", input_audio,
-            "-t", str(extract_duration),
-            "-c:a", "libmp3lame",
-            "-q:a", "2",
-            output_audio
-        ]
-        subprocess.run(cmd, capture_output=True, check=True)
-        print(f"  ✓ Extraído: {extract_duration:.1f}s (desde {start_time:.1f}s)")
-    else:
-        # Audio más corto que lo necesario - hacer loop
-        print(f"  ⚠️ Audio ({audio_duration:.1f}s) más corto que requerido ({extract_duration:.1f}s), haciendo loop...")
-        
-        # Usar filtro aloop para repetir el audio las veces necesarias
-        loops_needed = int(extract_duration / audio_duration) + 1
-        
-        cmd = [
-            "ffmpeg", "-y",
-            "-i", input_audio,
-            "-af", f"aloop=loop={loops_needed}:size={int(audio_duration * 48000)},atrim=0:{extract_duration}",
-            "-c:a", "libmp3lame",
-            "-q:a", "2",
-            output_audio
-        ]
-        subprocess.run(cmd, capture_output=True, check=True)
-        print(f"  ✓ Extraído con loop: {extract_duration:.1f}s")
+        # -ss antes de -i: búsqueda rápida a nivel de demuxer; el fondo musical
+        # no necesita precisión de muestra, así que evitamos decodificar hasta el punto exacto
+        return ["-noaccurate_seek", "-ss", str(start_time), "-t", str(extract_duration),
+                "-i", input_audio]
+    
+    # Audio más corto que lo necesario - repetir la entrada en loop
+    print(f"  ⚠️ Audio ({audio_duration:.1f}s) más corto que requerido ({extract_duration:.1f}s), haciendo loop...")
+    return ["-stream_loop", "-1", "-t", str(extract_duration), "-i", input_audio]
 
 
-def concatenate_with_crossfade(audio_files: list, output_file: str, crossfade: float):
-    """Concatenar audios con crossfade usando ffmpeg"""
-    if len(audio_files) == 0:
-        return
-    
-    if len(audio_files) == 1:
-        # Solo un archivo, copiar directamente
-        subprocess.run(["cp", audio_files[0], output_file], check=True)
-        return
-    
-    # Construir filtro complejo para crossfade
-    # [0][1]acrossfade=d=X[a01]; [a01][2]acrossfade=d=X[a012]; ...
-    
-    inputs = []
-    for f in audio_files:
-        inputs.extend(["-i", f])
+def build_audio_filter(num_segments: int, crossfade: float,
+                       fade: float, total_duration: float) -> str:
+    """
+    Construir el filter_complex que une los segmentos con crossfade
+    y aplica el fade in/out global sobre el resultado.
     
-    # Construir el filtro
+    Args:
+        num_segments: Número de entradas de audio (0..n-1)
+        crossfade: Duración del crossfade entre segmentos
+        fade: Duración del fade in/out global
+        total_duration: Duración final del audio combinado
+        
+    Returns:
+        Cadena filter_complex con la salida etiquetada [aout]
+    """
+    # [0:a][1:a]acrossfade=d=X[a1]; [a1][2:a]acrossfade=d=X[a2]; ...
     filter_parts = []
-    current_label = "[0]"
+    current_label = "[0:a]"
     
-    for i in range(1, len(audio_files)):
-        next_input = f"[{i}]"
-        output_label = f"[a{i}]" if i < len(audio_files) - 1 else ""
-        
+    for i in range(1, num_segments):
+        output_label = f"[a{i}]"
         filter_parts.append(
-            f"{current_label}{next_input}acrossfade=d={crossfade}:c1=tri:c2=tri{output_label}"
+            f"{current_label}[{i}:a]acrossfade=d={crossfade}:c1=tri:c2=tri{output_label}"
         )
-        current_label = f"[a{i}]"
-    
-    filter_complex = ";".join(filter_parts)
+        current_label = output_label
     
-    cmd = [
-        "ffmpeg", "-y",
-        *inputs,
-        "-filter_complex", filter_complex,
-        "-c:a", "libmp3lame",
-        "-q:a", "2",
-        output_file
-    ]
+    filter_parts.append(
+        f"{current_label}afade=t=in:st=0:d={fade},"
+        f"afade=t=out:st={total_duration - fade}:d={fade}[aout]"
+    )
     
-    subprocess.run(cmd, capture_output=True, check=True)
-
-
-def merge_audio_video(video_path: str, audio_path: str, output_path: str):
-    """Combinar video con audio"""
-    cmd = [
-        "ffmpeg", "-y",
-        "-i", video_path,
-        "-i", audio_path,
-        "-c:v", "copy",  # No re-encodear video
-        "-c:a", "aac",
-        "-b:a", "192k",
-        "-map", "0:v:0",  # Video del primer input
-        "-map", "1:a:0",  # Audio del segundo input
-        "-shortest",
-        output_path
-    ]
-    subprocess.run(cmd, capture_output=True, check=True)
+    return ";".join(filter_parts)
 
 
 def main():
@@ -179,100 +205,108 @@ def main():
     print("🎵 AGREGANDO AUDIO AL VIDEO RECAP")
     print("=" * 60)
     
-    # Crear carpeta temporal
-    temp_folder = Path("temp_audio")
-    temp_folder.mkdir(exist_ok=True)
+    input_video = os.path.join(OUTPUT_FOLDER, "2025_recap.mp4")
+    output_video = os.path.join(OUTPUT_FOLDER, "2025_recap_with_audio.mp4")
+    
+    if not os.path.exists(input_video):
+        print(f"  ❌ No se encontró el video: {input_video}")
+        return
     
     # Paso 1: Obtener duración de cada video mensual
     print("\n📊 Analizando duración de videos mensuales...")
-    month_durations = {}
+    video_paths = {}
+    
+    # Una sola lectura del directorio en vez de un stat por mes
+    with os.scandir(OUTPUT_FOLDER) as entries:
+        existing = {entry.name for entry in entries
+                    if entry.name.startswith("month_") and entry.is_file()}
     
     for month in range(1, 13):
-        month_names = [
-            "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-            "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
-        ]
-        video_path = os.path.join(OUTPUT_FOLDER, f"month_{month:02d}_{month_names[month-1]}.mp4")
+        filename = f"month_{month:02d}_{MONTH_NAMES[month-1]}.mp4"
+        video_path = os.path.join(OUTPUT_FOLDER, filename)
         
-        if os.path.exists(video_path):
-            duration = get_duration(video_path)
-            month_durations[month] = duration
-            print(f"  {month_names[month-1]}: {duration:.1f}s")
+        if filename in existing:
+            video_paths[month] = video_path
         else:
             print(f"  ⚠️ No encontrado: {video_path}")
     
-    # Paso 2: Extraer segmentos de audio para cada mes
-    print("\n🎵 Extrayendo segmentos de audio...")
-    audio_segments = []
+    # Los ffprobe son independientes y limitados por I/O: lanzarlos en paralelo
+    month_durations = {}
+    if video_paths:
+        workers = min(len(video_paths), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            month_durations = dict(zip(video_paths, executor.map(get_duration, video_paths.values())))
+    
+    for month, duration in month_durations.items():
+        print(f"  {MONTH_NAMES[month-1]}: {duration:.1f}s")
+    
+    # Paso 2: Elegir el audio de cada mes
+    print("\n🎵 Seleccionando audio por mes...")
+    audio_index = build_audio_index(AUDIO_FOLDER)
+    month_audio = []
     
     for month in range(1, 13):
         if month not in month_durations:
             continue
-            
-        duration = month_durations[month]
+        
         pattern = MONTH_AUDIO_PATTERNS.get(month)
         
         if not pattern:
             print(f"  ⚠️ Sin audio para mes {month}")
             continue
         
-        audio_path = find_audio_file(pattern, AUDIO_FOLDER)
+        audio_path = audio_index.get(pattern)
         if not audio_path:
             print(f"  ⚠️ No encontrado audio con patrón: {pattern}")
             continue
         
-        month_names = [
-            "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
-            "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
-        ]
-        print(f"  {month_names[month-1]}:", end=" ")
+        month_audio.append((month, audio_path))
+    
+    if not month_audio:
+        print("  ❌ No hay audio para ningún mes")
+        return
+    
+    # Paso 3: Preparar segmentos (inicio aleatorio por mes)
+    # Todos los segmentos excepto el último necesitan compensación por crossfade
+    inputs = []
+    for i, (month, audio_path) in enumerate(month_audio):
+        print(f"  {MONTH_NAMES[month-1]}:", end=" ")
         
-        # Extraer segmento (con compensación de crossfade excepto el último)
-        segment_path = str(temp_folder / f"segment_{month:02d}.mp3")
-        # Todos los segmentos excepto el último necesitan compensación por crossfade
-        is_last = (month == 12)
+        is_last = (i == len(month_audio) - 1)
         compensation = 0 if is_last else CROSSFADE_DURATION
-        extract_audio_segment(audio_path, segment_path, duration, compensation)
-        audio_segments.append(segment_path)
-    
-    # Paso 3: Concatenar con crossfade
-    print(f"\n🔀 Concatenando {len(audio_segments)} segmentos con crossfade de {CROSSFADE_DURATION}s...")
-    combined_audio_raw = str(temp_folder / "combined_audio_raw.mp3")
-    concatenate_with_crossfade(audio_segments, combined_audio_raw, CROSSFADE_DURATION)
-    print("  ✓ Audio combinado creado")
-    
-    # Paso 3.5: Agregar fade in/out global
-    print("\n🎚️ Aplicando fade in/out global...")
-    combined_audio = str(temp_folder / "combined_audio.mp3")
-    audio_total_duration = get_duration(combined_audio_raw)
-    fade_global = 2.0  # 2 segundos de fade in al inicio y fade out al final
-    
-    fade_cmd = [
-        "ffmpeg", "-y",
-        "-i", combined_audio_raw,
-        "-af", f"afade=t=in:st=0:d={fade_global},afade=t=out:st={audio_total_duration - fade_global}:d={fade_global}",
-        "-c:a", "libmp3lame",
-        "-q:a", "2",
-        combined_audio
-    ]
-    subprocess.run(fade_cmd, capture_output=True, check=True)
-    print(f"  ✓ Fade in/out aplicado ({fade_global}s)")
+        inputs.extend(build_segment_input(audio_path, month_durations[month], compensation))
     
-    # Paso 4: Combinar con el video final
-    print("\n🎬 Combinando audio con video...")
-    input_video = os.path.join(OUTPUT_FOLDER, "2025_recap.mp4")
-    output_video = os.path.join(OUTPUT_FOLDER, "2025_recap_with_audio.mp4")
+    # Cada crossfade consume la compensación añadida, así que el total
+    # es exactamente la suma de las duraciones mensuales
+    audio_total_duration = sum(month_durations[month] for month, _ in month_audio)
+    fade_global = 2.0  # 2 segundos de fade in al inicio y fade out al final
     
-    if not os.path.exists(input_video):
-        print(f"  ❌ No se encontró el video: {input_video}")
-        return
+    filter_complex = build_audio_filter(
+        len(month_audio), CROSSFADE_DURATION, fade_global, audio_total_duration
+    )
     
-    merge_audio_video(input_video, combined_audio, output_video)
+    # Paso 4: Crossfade + fade global + mezcla con el video en una sola llamada
+    print(f"\n🔀 Uniendo {len(month_audio)} segmentos con crossfade de {CROSSFADE_DURATION}s "
+          f"y fade in/out de {fade_global}s...")
+    video_index = len(month_audio)
     
-    # Limpiar temporales
-    print("\n🧹 Limpiando archivos temporales...")
-    import shutil
-    shutil.rmtree(temp_folder)
+    cmd = [
+        "ffmpeg", "-y",
+        *inputs,
+        "-i", input_video,
+        "-filter_complex", filter_complex,
+        "-threads", "0",  # Dejar que ffmpeg use todos los núcleos
+        "-map", f"{video_index}:v:0",  # Video del último input
+        "-map", "[aout]",  # Audio combinado
+        "-c:v", "copy",  # No re-encodear video
+        "-c:a", "aac",
+        "-b:a", "192k",
+        "-shortest",
+        output_video
+    ]
+    # La salida de ffmpeg no se usa: mandarla directo a /dev/null sin buffers en Python
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    print("  ✓ Audio combinado con el video")
     
     # Resultado final
     final_duration = get_duration(output_video)
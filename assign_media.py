@@ -3,19 +3,24 @@ Phase 2: Media Assignment Script
 Scans media files and assigns them to days of 2025 based on metadata
 """
 import os
-import json
 import csv
-from datetime import datetime, date
+import calendar
+from datetime import datetime, date, timedelta
 from collections import defaultdict
-from typing import Dict, List, Tuple
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import logging
 
 from config import (
-    INPUT_FOLDER, TARGET_YEAR, ALL_SUPPORTED_FORMATS,
+    INPUT_FOLDER, TARGET_YEAR, ALL_SUPPORTED_FORMATS, MEDIA_TYPE_BY_EXT,
     MEDIA_ASSIGNMENT_JSON, REPORT_VISUAL_TXT, REPORT_DETAILED_CSV,
-    LOG_LEVEL
+    LOG_LEVEL, WORKERS, METADATA_DATE_CACHE_JSON
+)
+from utils import (
+    get_media_date, json_dumps, setup_logging, load_metadata_date_cache,
+    save_metadata_date_cache, pop_new_metadata_dates, update_metadata_date_cache
 )
-from utils import get_media_date, is_image, is_video, is_gif, setup_logging
 
 
 def scan_media_folder(folder_path: str) -> List[str]:
@@ -31,29 +36,47 @@ def scan_media_folder(folder_path: str) -> List[str]:
     media_files = []
     
     if not os.path.exists(folder_path):
-        logging.error(f"Folder not found: {folder_path}")
+        logging.error("Folder not found: %s", folder_path)
         return media_files
     
-    for filename in os.listdir(folder_path):
-        filepath = os.path.join(folder_path, filename)
-        
-        if not os.path.isfile(filepath):
-            continue
-        
-        ext = os.path.splitext(filename)[1].lower()
-        if ext in ALL_SUPPORTED_FORMATS:
-            media_files.append(filepath)
+    # scandir reuses the directory entry type, avoiding a stat per file
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            
+            ext = os.path.splitext(entry.name)[1].lower()
+            if ext in ALL_SUPPORTED_FORMATS:
+                media_files.append(entry.path)
     
-    logging.info(f"Found {len(media_files)} media files")
+    logging.info("Found %d media files", len(media_files))
     return media_files
 
 
-def assign_media_to_days(media_files: List[str]) -> Dict[str, List[Dict]]:
+def _probe_one(filepath: str) -> Tuple[str, Optional[datetime], Optional[str], Optional[str], Dict[str, str]]:
+    """
+    Extract the date of a single file (runs in a worker process)
+    
+    Args:
+        filepath: Path to media file
+        
+    Returns:
+        Tuple of (filepath, date, source, error message, new metadata cache entries)
+    """
+    try:
+        media_date, source = get_media_date(filepath)
+        return filepath, media_date, source, None, pop_new_metadata_dates()
+    except Exception as e:
+        return filepath, None, None, str(e), pop_new_metadata_dates()
+
+
+def assign_media_to_days(media_files: List[str], workers: int = WORKERS) -> Dict[str, List[Dict]]:
     """
     Assign media files to specific days based on extracted dates
     
     Args:
         media_files: List of media file paths
+        workers: Worker processes for metadata extraction (0 = serial)
         
     Returns:
         Dictionary mapping date strings (YYYY-MM-DD) to list of media info
@@ -66,57 +89,68 @@ def assign_media_to_days(media_files: List[str]) -> Dict[str, List[Dict]]:
         'date_sources': defaultdict(int)
     }
     
-    for filepath in media_files:
-        filename = os.path.basename(filepath)
-        
-        try:
-            media_date, source = get_media_date(filepath)
+    # Metadata extraction (EXIF parsing, ffprobe) is independent per file.
+    # Dates read by earlier runs are reused for files that haven't changed
+    load_metadata_date_cache(METADATA_DATE_CACHE_JSON)
+    executor = None
+    if workers and len(media_files) > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=load_metadata_date_cache,
+                                       initargs=(METADATA_DATE_CACHE_JSON,))
+        results = executor.map(_probe_one, media_files, chunksize=32)
+    else:
+        results = map(_probe_one, media_files)
+    
+    try:
+        for filepath, media_date, source, error, cache_entries in results:
+            filename = os.path.basename(filepath)
+            update_metadata_date_cache(cache_entries)
+            
+            if error:
+                logging.error("Error processing %s: %s", filename, error)
+                continue
             
             # Only include files from target year
             if media_date.year != TARGET_YEAR:
                 stats['skipped_wrong_year'] += 1
-                logging.debug(f"Skipping {filename} - wrong year: {media_date.year}")
+                logging.debug("Skipping %s - wrong year: %d", filename, media_date.year)
                 continue
             
             # Format date as string key
             date_key = media_date.strftime("%Y-%m-%d")
             
             # Determine media type
-            if is_gif(filepath):
-                media_type = 'gif'
-            elif is_video(filepath):
-                media_type = 'video'
-            elif is_image(filepath):
-                media_type = 'image'
-            else:
-                media_type = 'unknown'
+            ext = os.path.splitext(filename)[1].lower()
+            media_type = MEDIA_TYPE_BY_EXT.get(ext, 'unknown')
             
-            # Add to assignments
-            assignments[date_key].append({
+            # Add to assignments, keeping the datetime alongside as the sort key
+            assignments[date_key].append((media_date, {
                 'filepath': filepath,
                 'filename': filename,
                 'type': media_type,
                 'date': media_date.isoformat(),
                 'source': source
-            })
+            }))
             
             stats['assigned'] += 1
             stats['date_sources'][source] += 1
-            
-        except Exception as e:
-            logging.error(f"Error processing {filename}: {e}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        save_metadata_date_cache(METADATA_DATE_CACHE_JSON)
     
     # Sort media within each day by timestamp
-    for date_key in assignments:
-        assignments[date_key].sort(key=lambda x: x['date'])
+    by_timestamp = itemgetter(0)
+    for date_key, media_list in assignments.items():
+        media_list.sort(key=by_timestamp)
+        assignments[date_key] = [media_info for _, media_info in media_list]
     
-    logging.info(f"\nAssignment Statistics:")
-    logging.info(f"  Total files scanned: {stats['total_files']}")
-    logging.info(f"  Files assigned: {stats['assigned']}")
-    logging.info(f"  Files skipped (wrong year): {stats['skipped_wrong_year']}")
-    logging.info(f"\nDate extraction sources:")
+    logging.info("\nAssignment Statistics:")
+    logging.info("  Total files scanned: %d", stats['total_files'])
+    logging.info("  Files assigned: %d", stats['assigned'])
+    logging.info("  Files skipped (wrong year): %d", stats['skipped_wrong_year'])
+    logging.info("\nDate extraction sources:")
     for source, count in stats['date_sources'].items():
-        logging.info(f"  {source}: {count}")
+        logging.info("  %s: %d", source, count)
     
     return dict(assignments)
 
@@ -131,8 +165,6 @@ def generate_visual_report(assignments: Dict[str, List[Dict]]) -> str:
     Returns:
         Visual report as string
     """
-    import calendar
-    
     report_lines = []
     report_lines.append("=" * 60)
     report_lines.append(f"YEAR {TARGET_YEAR} MEDIA COVERAGE REPORT")
@@ -147,8 +179,14 @@ def generate_visual_report(assignments: Dict[str, List[Dict]]) -> str:
     report_lines.append(f"Average media per day: {total_media / max(filled_days, 1):.1f}")
     report_lines.append("")
     
+    # Bucket date keys by "YYYY-MM" once instead of filtering per month
+    by_month = defaultdict(list)
+    for date_key in assignments:
+        by_month[date_key[:7]].append(date_key)
+    
     # Month by month breakdown
     for month in range(1, 13):
+        month_prefix = f"{TARGET_YEAR}-{month:02d}"
         month_name = calendar.month_name[month]
         report_lines.append(f"\n{month_name} {TARGET_YEAR}")
         report_lines.append("-" * 30)
@@ -163,7 +201,7 @@ def generate_visual_report(assignments: Dict[str, List[Dict]]) -> str:
                 if day == 0:
                     week_str.append("  ")
                 else:
-                    date_key = f"{TARGET_YEAR}-{month:02d}-{day:02d}"
+                    date_key = f"{month_prefix}-{day:02d}"
                     if date_key in assignments:
                         count = len(assignments[date_key])
                         if count > 9:
@@ -175,7 +213,7 @@ def generate_visual_report(assignments: Dict[str, List[Dict]]) -> str:
             report_lines.append(" ".join(week_str))
         
         # Month summary
-        month_days = [d for d in assignments.keys() if d.startswith(f"{TARGET_YEAR}-{month:02d}")]
+        month_days = by_month.get(month_prefix, [])
         month_media = sum(len(assignments[d]) for d in month_days)
         report_lines.append(f"  {len(month_days)} days, {month_media} media files")
     
@@ -186,65 +224,61 @@ def generate_visual_report(assignments: Dict[str, List[Dict]]) -> str:
     return "\n".join(report_lines)
 
 
-def generate_csv_report(assignments: Dict[str, List[Dict]]) -> List[List[str]]:
+def iter_csv_rows(assignments: Dict[str, List[Dict]]) -> Iterator[List[str]]:
     """
-    Generate detailed CSV report
+    Generate detailed CSV report rows lazily
     
     Args:
         assignments: Date to media mapping
         
-    Returns:
-        List of rows for CSV
+    Yields:
+        Header row, then one row per media file (or per empty day)
     """
-    rows = [['Date', 'Day_of_Week', 'Media_Count', 'Filename', 'Type', 'Date_Source']]
+    yield ['Date', 'Day_of_Week', 'Media_Count', 'Filename', 'Type', 'Date_Source']
     
     # Generate all days of the year
     start_date = date(TARGET_YEAR, 1, 1)
     for day_offset in range(365):
-        current_date = date(TARGET_YEAR, 1, 1)
-        from datetime import timedelta
         current_date = start_date + timedelta(days=day_offset)
-        date_key = current_date.strftime("%Y-%m-%d")
-        day_name = current_date.strftime("%A")
+        date_key = current_date.isoformat()
+        day_name = calendar.day_name[current_date.weekday()]
         
         if date_key in assignments:
             media_list = assignments[date_key]
             for media_info in media_list:
-                rows.append([
+                yield [
                     date_key,
                     day_name,
                     str(len(media_list)),
                     media_info['filename'],
                     media_info['type'],
                     media_info['source']
-                ])
+                ]
         else:
             # Empty day
-            rows.append([date_key, day_name, '0', '', '', ''])
-    
-    return rows
+            yield [date_key, day_name, '0', '', '', '']
 
 
 def save_assignment_json(assignments: Dict, filepath: str):
     """Save assignments to JSON file"""
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(assignments, f, indent=2, ensure_ascii=False)
-    logging.info(f"Saved assignment data to: {filepath}")
+    with open(filepath, 'wb') as f:
+        f.write(json_dumps(assignments, indent=True))
+    logging.info("Saved assignment data to: %s", filepath)
 
 
 def save_visual_report(report: str, filepath: str):
     """Save visual report to text file"""
     with open(filepath, 'w', encoding='utf-8') as f:
         f.write(report)
-    logging.info(f"Saved visual report to: {filepath}")
+    logging.info("Saved visual report to: %s", filepath)
 
 
-def save_csv_report(rows: List[List[str]], filepath: str):
-    """Save CSV report"""
+def save_csv_report(rows: Iterable[List[str]], filepath: str):
+    """Save CSV report (rows are streamed straight to the writer)"""
     with open(filepath, 'w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
         writer.writerows(rows)
-    logging.info(f"Saved detailed report to: {filepath}")
+    logging.info("Saved detailed report to: %s", filepath)
 
 
 def main():
@@ -254,8 +288,8 @@ def main():
     logging.info("=" * 60)
     logging.info("MEDIA ASSIGNMENT SCRIPT - PHASE 2")
     logging.info("=" * 60)
-    logging.info(f"Scanning folder: {INPUT_FOLDER}")
-    logging.info(f"Target year: {TARGET_YEAR}")
+    logging.info("Scanning folder: %s", INPUT_FOLDER)
+    logging.info("Target year: %s", TARGET_YEAR)
     logging.info("")
     
     # Step 1: Scan for media files
@@ -281,16 +315,15 @@ def main():
     print("\n" + visual_report)
     
     # CSV detailed report
-    csv_rows = generate_csv_report(assignments)
-    save_csv_report(csv_rows, REPORT_DETAILED_CSV)
+    save_csv_report(iter_csv_rows(assignments), REPORT_DETAILED_CSV)
     
     logging.info("\n" + "=" * 60)
     logging.info("MEDIA ASSIGNMENT COMPLETE")
     logging.info("=" * 60)
-    logging.info(f"\nOutput files:")
-    logging.info(f"  1. {MEDIA_ASSIGNMENT_JSON}")
-    logging.info(f"  2. {REPORT_VISUAL_TXT}")
-    logging.info(f"  3. {REPORT_DETAILED_CSV}")
+    logging.info("\nOutput files:")
+    logging.info("  1. %s", MEDIA_ASSIGNMENT_JSON)
+    logging.info("  2. %s", REPORT_VISUAL_TXT)
+    logging.info("  3. %s", REPORT_DETAILED_CSV)
     logging.info("\nNext step: Run generate_video.py to create the final video")
 
 
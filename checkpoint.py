@@ -2,12 +2,17 @@
 Checkpoint Manager for Resume Functionality
 Allows the video generation process to resume from where it left off after interruption
 """
-import json
+import atexit
 import os
 import logging
+import tempfile
+import threading
+import time
 from datetime import datetime
 from typing import Dict, List, Optional, Set
 
+from utils import json_dumps, json_loads
+
 
 class CheckpointManager:
     """Manages checkpoints for resuming interrupted video generation"""
@@ -21,6 +26,11 @@ class CheckpointManager:
         """
         self.checkpoint_file = checkpoint_file
         self.checkpoint_data = self._load()
+        self._dirty = False
+        self._last_flush = 0.0
+        # Guards checkpoint_data and the file; reentrant because mark_* calls save()
+        self._lock = threading.RLock()
+        atexit.register(self.flush)
     
     def _load(self) -> Dict:
         """Load checkpoint data from file"""
@@ -28,12 +38,12 @@ class CheckpointManager:
             return self._create_empty_checkpoint()
         
         try:
-            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                logging.info(f"📋 Loaded checkpoint from {self.checkpoint_file}")
+            with open(self.checkpoint_file, 'rb') as f:
+                data = json_loads(f.read())
+                logging.info("📋 Loaded checkpoint from %s", self.checkpoint_file)
                 return data
         except Exception as e:
-            logging.warning(f"Error loading checkpoint: {e}. Starting fresh.")
+            logging.warning("Error loading checkpoint: %s. Starting fresh.", e)
             return self._create_empty_checkpoint()
     
     def _create_empty_checkpoint(self) -> Dict:
@@ -49,15 +59,37 @@ class CheckpointManager:
         }
     
     def save(self):
-        """Save current checkpoint to disk"""
-        self.checkpoint_data['last_update'] = datetime.now().isoformat()
-        
-        try:
-            with open(self.checkpoint_file, 'w', encoding='utf-8') as f:
-                json.dump(self.checkpoint_data, f, indent=2)
-            logging.debug(f"💾 Checkpoint saved")
-        except Exception as e:
-            logging.error(f"Error saving checkpoint: {e}")
+        """Save current checkpoint to disk (atomically, via a temp file + rename)"""
+        with self._lock:
+            self.checkpoint_data['last_update'] = datetime.now().isoformat()
+            
+            tmp_path = None
+            try:
+                checkpoint_dir = os.path.dirname(os.path.abspath(self.checkpoint_file))
+                with tempfile.NamedTemporaryFile('wb', dir=checkpoint_dir,
+                                                 suffix='.tmp', delete=False) as f:
+                    tmp_path = f.name
+                    f.write(json_dumps(self.checkpoint_data))
+                os.replace(tmp_path, self.checkpoint_file)
+                self._dirty = False
+                self._last_flush = time.monotonic()
+                logging.debug("💾 Checkpoint saved")
+            except Exception as e:
+                logging.error("Error saving checkpoint: %s", e)
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+    
+    def flush(self):
+        """Write pending changes to disk, if any"""
+        with self._lock:
+            if self._dirty:
+                self.save()
+    
+    def _mark_dirty(self):
+        """Record a change and save it unless the last write was under a second ago"""
+        self._dirty = True
+        if time.monotonic() - self._last_flush > 1.0:
+            self.save()
     
     def mark_step_complete(self, step_name: str):
         """
@@ -66,10 +98,11 @@ class CheckpointManager:
         Args:
             step_name: Name of the step (e.g., 'media_scan', 'media_assignment')
         """
-        if step_name in self.checkpoint_data['steps_completed']:
-            self.checkpoint_data['steps_completed'][step_name] = True
-            self.save()
-            logging.info(f"✓ Step completed: {step_name}")
+        with self._lock:
+            if step_name in self.checkpoint_data['steps_completed']:
+                self.checkpoint_data['steps_completed'][step_name] = True
+                self._mark_dirty()
+                logging.info("✓ Step completed: %s", step_name)
     
     def mark_month_complete(self, month: int):
         """
@@ -78,12 +111,13 @@ class CheckpointManager:
         Args:
             month: Month number (1-12)
         """
-        months = self.checkpoint_data['steps_completed']['months_processed']
-        if month not in months:
-            months.append(month)
-            months.sort()
-            self.save()
-            logging.info(f"✓ Month {month} completed")
+        with self._lock:
+            months = self.checkpoint_data['steps_completed']['months_processed']
+            if month not in months:
+                months.append(month)
+                months.sort()
+                self._mark_dirty()
+                logging.info("✓ Month %d completed", month)
     
     def is_step_complete(self, step_name: str) -> bool:
         """Check if a step is already complete"""
@@ -100,11 +134,12 @@ class CheckpointManager:
         Args:
             month: Month number (1-12)
         """
-        months = self.checkpoint_data['steps_completed']['months_processed']
-        if month in months:
-            months.remove(month)
-            self.save()
-            logging.info(f"🔄 Month {month} invalidated - will be regenerated")
+        with self._lock:
+            months = self.checkpoint_data['steps_completed']['months_processed']
+            if month in months:
+                months.remove(month)
+                self._mark_dirty()
+                logging.info("🔄 Month %d invalidated - will be regenerated", month)
     
     def invalidate_months(self, months_to_invalidate: List[int]):
         """
@@ -115,6 +150,7 @@ class CheckpointManager:
         """
         for month in months_to_invalidate:
             self.invalidate_month(month)
+        self.flush()
     
     def get_completed_months(self) -> List[int]:
         """Get list of completed months"""
@@ -122,9 +158,10 @@ class CheckpointManager:
     
     def mark_all_complete(self):
         """Mark the entire process as complete"""
-        self.checkpoint_data['completed'] = True
-        self.save()
-        logging.info("✅ All processing complete!")
+        with self._lock:
+            self.checkpoint_data['completed'] = True
+            self.save()
+            logging.info("✅ All processing complete!")
     
     def is_complete(self) -> bool:
         """Check if the entire process is complete"""
@@ -132,13 +169,15 @@ class CheckpointManager:
     
     def clear(self):
         """Clear checkpoint (start fresh)"""
-        self.checkpoint_data = self._create_empty_checkpoint()
-        if os.path.exists(self.checkpoint_file):
-            try:
-                os.remove(self.checkpoint_file)
-                logging.info("🔄 Checkpoint cleared - starting fresh")
-            except Exception as e:
-                logging.error(f"Error clearing checkpoint: {e}")
+        with self._lock:
+            self.checkpoint_data = self._create_empty_checkpoint()
+            self._dirty = False
+            if os.path.exists(self.checkpoint_file):
+                try:
+                    os.remove(self.checkpoint_file)
+                    logging.info("🔄 Checkpoint cleared - starting fresh")
+                except Exception as e:
+                    logging.error("Error clearing checkpoint: %s", e)
     
     def get_progress_summary(self) -> str:
         """Get a human-readable summary of progress"""
@@ -10,13 +10,19 @@ OUTPUT_FOLDER = PROJECT_ROOT
 OUTPUT_VIDEO_FOLDER = os.path.join(PROJECT_ROOT, "output")  # Separate folder for final videos
 PROCESSED_FOLDER = os.path.join(PROJECT_ROOT, "processed")
 TEMP_FOLDER = os.path.join(PROJECT_ROOT, "temp")
+CACHE_FOLDER = os.path.join(PROJECT_ROOT, "cache")  # Persistent caches (never removed by cleanup)
+PREVIEW_CACHE_FOLDER = os.path.join(CACHE_FOLDER, "preview_cache")  # JPEG previews of HEIC files for the validator UI
 
 # Output files
 MEDIA_ASSIGNMENT_JSON = os.path.join(OUTPUT_FOLDER, "media_assignment.json")
+MEDIA_ASSIGNMENT_SIG = os.path.join(OUTPUT_FOLDER, ".media_assignment.sig")  # Media folder fingerprint the assignment was built from
 REPORT_VISUAL_TXT = os.path.join(OUTPUT_FOLDER, "report_visual.txt")
 REPORT_DETAILED_CSV = os.path.join(OUTPUT_FOLDER, "report_detailed.csv")
 FINAL_VIDEO = os.path.join(OUTPUT_VIDEO_FOLDER, "2025_recap.mp4")
 CHECKPOINT_FILE = os.path.join(OUTPUT_FOLDER, "checkpoint.json")  # For resume functionality
+DURATION_CACHE_JSON = os.path.join(CACHE_FOLDER, "duration_cache.json")  # Cached ffprobe durations
+PROCESSED_INDEX_JSON = os.path.join(PROCESSED_FOLDER, "processed_index.json")  # Source file -> processed clip
+METADATA_DATE_CACHE_JSON = os.path.join(OUTPUT_FOLDER, "metadata_date_cache.json")  # Cached EXIF/video metadata dates
 
 
 # Supported formats
@@ -24,6 +30,11 @@ SUPPORTED_IMAGE_FORMATS = {'.jpg', '.jpeg', '.png', '.heic', '.gif'}
 SUPPORTED_VIDEO_FORMATS = {'.mp4', '.mov', '.avi', '.mkv'}
 ALL_SUPPORTED_FORMATS = SUPPORTED_IMAGE_FORMATS | SUPPORTED_VIDEO_FORMATS
 
+# Media type by extension (GIF takes precedence over the generic image type)
+MEDIA_TYPE_BY_EXT = {ext: 'image' for ext in SUPPORTED_IMAGE_FORMATS}
+MEDIA_TYPE_BY_EXT.update({ext: 'video' for ext in SUPPORTED_VIDEO_FORMATS})
+MEDIA_TYPE_BY_EXT['.gif'] = 'gif'
+
 # Year configuration
 TARGET_YEAR = 2025
 
@@ -35,7 +46,9 @@ VIDEO_SETTINGS = {
     'audio_codec': 'aac',
     'crf': 23,  # Quality (lower = better quality, larger file)
     'preset': 'medium',  # Encoding speed vs compression
-    'pixel_format': 'yuv420p'
+    'pixel_format': 'yuv420p',
+    'hw_encoder': 'auto',  # 'auto' (NVENC/VideoToolbox if usable), 'none', or an ffmpeg encoder name (e.g. 'hevc_nvenc' for HEVC output)
+    'hw_decode': True  # Decode source videos on the GPU when a hardware encoder is in use
 }
 
 # Content duration settings (in seconds)
@@ -79,5 +92,15 @@ DATE_CAPTION = {
     'margin': 20  # Pixels from edge
 }
 
+# Parallelism
+WORKERS = os.cpu_count() or 1  # Processes for metadata extraction (0 = serial, for debugging)
+ENCODE_WORKERS = max(1, (os.cpu_count() or 1) // 2)  # Processes for per-clip ffmpeg encoding (each ffmpeg is multi-threaded; 0 = serial)
+MONTH_WORKERS = min(12, max(1, (os.cpu_count() or 1) // 2))  # Months generated concurrently
+KEN_BURNS_BATCH_SIZE = 16  # Photos rendered per ffmpeg process with the software encoder (1 = one process per photo; hardware encoders always use 1)
+COMPILE_MAX_INPUTS = 64  # Clips decoded by one ffmpeg filter graph when compiling a month (longer months are compiled in parts)
+
+# Media validator UI
+VALIDATOR_USE_X_SENDFILE = False  # Let a front web server (e.g. Apache mod_xsendfile) send /media files; leave off for the built-in server
+
 # Logging
 LOG_LEVEL = "INFO"
@@ -5,22 +5,72 @@ Lee URLs de un archivo de texto y descarga el audio en MP3
 """
 
 import os
-import subprocess
+import json
+import shutil
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+try:
+    from yt_dlp import YoutubeDL
+    YTDLP_AVAILABLE = True
+except ImportError:
+    YTDLP_AVAILABLE = False
+
 # Configuración
 URLS_FILE = "urls.txt"  # Archivo con URLs (una por línea)
 OUTPUT_FOLDER = "audio"  # Carpeta de salida
+MAX_WORKERS = 4  # Descargas simultáneas
+MIN_INTERVAL = 0.5  # Segundos mínimos entre el inicio de dos descargas (evita errores 429)
+MANIFEST_FILE = ".downloaded.json"  # En OUTPUT_FOLDER: {"NN.mp3": url} de descargas anteriores
 
+class RateLimiter:
+    """Espaciar el inicio de las descargas al menos `interval` segundos"""
+    
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+    
+    def wait(self):
+        """Bloquear hasta el siguiente turno libre"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot)
+            self._next_slot = start + self.interval
+        time.sleep(start - now)
 
-def check_ytdlp():
-    """Verificar si yt-dlp está instalado"""
-    try:
-        subprocess.run(["yt-dlp", "--version"], capture_output=True, check=True)
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False
+
+_rate_limiter = RateLimiter(MIN_INTERVAL)
+
+# Una instancia de YoutubeDL por hilo: se reutiliza entre URLs (sesión,
+# cookies, extractores ya cargados) sin compartirla entre hilos
+_thread_local = threading.local()
+
+
+def get_downloader(output_folder: str) -> "YoutubeDL":
+    """Obtener (o crear) la instancia de YoutubeDL del hilo actual"""
+    ydl = getattr(_thread_local, "ydl", None)
+    if ydl is None:
+        ydl = YoutubeDL({
+            "format": "bestaudio/best",
+            "postprocessors": [{
+                "key": "FFmpegExtractAudio",
+                "preferredcodec": "mp3",
+                "preferredquality": "0",  # Best quality
+            }],
+            # Se guarda con el id del video y luego se renombra al índice
+            "outtmpl": f"{output_folder}/%(id)s.%(ext)s",
+            "noplaylist": True,  # Solo el video, no toda la playlist
+            "ignoreerrors": True,
+            "concurrent_fragment_downloads": 4,  # Fragmentos en paralelo
+            "quiet": True,
+            "noprogress": True,
+        })
+        _thread_local.ydl = ydl
+    return ydl
 
 
 def download_audio(url: str, output_folder: str, index: int) -> bool:
@@ -36,35 +86,51 @@ def download_audio(url: str, output_folder: str, index: int) -> bool:
         True si se descargó correctamente
     """
     try:
-        # Nombre del archivo basado en el índice: 01.mp3, 02.mp3, etc.
-        output_filename = f"{index:02d}.mp3"
-        output_path = os.path.join(output_folder, output_filename)
-        
-        cmd = [
-            "yt-dlp",
-            "-x",  # Extract audio
-            "--audio-format", "mp3",
-            "--audio-quality", "0",  # Best quality
-            "-o", f"{output_folder}/{index:02d}.%(ext)s",  # Nombre numérico
-            "--no-playlist",  # Solo el video, no toda la playlist
-            "--ignore-errors",
-            url.strip()
-        ]
+        # El número de descargas simultáneas lo limita el pool (MAX_WORKERS);
+        # aquí sólo se espacian los inicios para no saturar a YouTube
+        _rate_limiter.wait()
+        info = get_downloader(output_folder).extract_info(url, download=True)
+        if not info or not info.get("requested_downloads"):
+            return False
         
-        result = subprocess.run(cmd, capture_output=False)
-        return result.returncode == 0
+        # Nombre del archivo basado en el índice: 01.mp3, 02.mp3, etc.
+        filepath = info["requested_downloads"][0]["filepath"]
+        os.replace(filepath, os.path.join(output_folder, f"{index:02d}.mp3"))
+        return True
         
     except Exception as e:
         print(f"  ❌ Error: {e}")
         return False
 
 
+def load_manifest(output_folder: str):
+    """Cargar el registro {"NN.mp3": url} de descargas anteriores (None si no existe)"""
+    try:
+        with open(os.path.join(output_folder, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(output_folder: str, manifest: dict):
+    """Guardar el registro de descargas (escritura atómica)"""
+    path = os.path.join(output_folder, MANIFEST_FILE)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def _clean(line: str):
+    """Devolver la URL de una línea, o None si está vacía o es un comentario"""
+    line = line.strip()
+    return line if line and line[0] != '#' else None
+
+
 def main():
     # Verificar yt-dlp
-    if not check_ytdlp():
+    if not YTDLP_AVAILABLE:
         print("❌ yt-dlp no está instalado.")
         print("   Instálalo con: pip install yt-dlp")
-        print("   O en Linux:    sudo apt install yt-dlp")
         sys.exit(1)
     
     # Verificar archivo de URLs
@@ -86,29 +152,101 @@ def main():
     
     # Leer URLs
     with open(URLS_FILE, 'r') as f:
-        urls = [line.strip() for line in f 
-                if line.strip() and not line.startswith('#')]
+        urls = list(filter(None, map(_clean, f)))
     
     if not urls:
         print(f"❌ No hay URLs válidas en {URLS_FILE}")
         sys.exit(1)
     
-    print(f"🎵 Descargando {len(urls)} audios a '{OUTPUT_FOLDER}/'")
-    print("=" * 50)
+    # Archivos ya descargados (no vacíos) y a qué URL corresponde cada uno
+    with os.scandir(OUTPUT_FOLDER) as entries:
+        existing = {entry.name for entry in entries
+                    if entry.name.endswith('.mp3') and entry.is_file() and entry.stat().st_size > 0}
+    manifest = load_manifest(OUTPUT_FOLDER)
+    if manifest is None:
+        # Sin registro (descargas de versiones anteriores): suponer que cada NN.mp3
+        # corresponde a la URL de la línea NN
+        manifest = {f"{i:02d}.mp3": url for i, url in enumerate(urls, 1)}
+    previous = {name: url for name, url in manifest.items() if name in existing}
+    previous_location = {url: name for name, url in previous.items()}
     
-    success = 0
-    failed = 0
+    # Planear: las URLs repetidas se descargan una sola vez; las que ya están en
+    # su lugar se omiten y las que cambiaron de posición se reubican sin descargar
+    first_index = {}  # url -> índice de la primera aparición
+    duplicates = {}  # url -> índices repetidos (se copian al terminar)
+    skipped = []
+    moves = []
+    pending = []
     
     for i, url in enumerate(urls, 1):
-        print(f"\n[{i}/{len(urls)}] Descargando como {i:02d}.mp3...")
-        print(f"  URL: {url[:60]}...")
+        if url in first_index:
+            duplicates.setdefault(url, []).append(i)
+            continue
+        first_index[url] = i
         
-        if download_audio(url, OUTPUT_FOLDER, i):
-            print(f"  ✅ Guardado como {i:02d}.mp3")
-            success += 1
+        target = f"{i:02d}.mp3"
+        if previous.get(target) == url:
+            skipped.append(i)
+        elif url in previous_location:
+            moves.append((previous_location[url], target, i))
         else:
-            print(f"  ❌ Falló")
-            failed += 1
+            pending.append((i, url))
+    
+    # Reubicar: primero enlazar todos los originales y después colocarlos, para
+    # que un intercambio (01 <-> 02) no pise un archivo antes de haberlo leído
+    staged = []
+    for source, target, i in moves:
+        stage_path = os.path.join(OUTPUT_FOLDER, f".{target}.tmp")
+        try:
+            os.link(os.path.join(OUTPUT_FOLDER, source), stage_path)
+        except OSError:
+            shutil.copyfile(os.path.join(OUTPUT_FOLDER, source), stage_path)
+        staged.append((stage_path, target, i))
+    for stage_path, target, i in staged:
+        os.replace(stage_path, os.path.join(OUTPUT_FOLDER, target))
+    
+    print(f"🎵 Descargando {len(pending)} de {len(urls)} audios a '{OUTPUT_FOLDER}/'")
+    if skipped or moves:
+        print(f"   ⏭️ Ya descargados: {len(skipped) + len(moves)}")
+    print("=" * 50)
+    
+    success = len(skipped) + len(moves)
+    failed = 0
+    done = skipped + [i for _, _, i in moves]
+    
+    # Las descargas están limitadas por la red: lanzarlas en paralelo.
+    # Los índices ya están asignados, así que el orden de los nombres se mantiene
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {executor.submit(download_audio, url, OUTPUT_FOLDER, i): url
+                   for i, url in pending}
+        
+        for future in as_completed(futures):
+            url = futures[future]
+            ok = future.result()
+            print(f"\n[{first_index[url]}/{len(urls)}] {url[:60]}...")
+            
+            if ok:
+                print(f"  ✅ Guardado como {first_index[url]:02d}.mp3")
+                success += 1
+                done.append(first_index[url])
+            else:
+                print(f"  ❌ Falló")
+                failed += 1
+    
+    # Copias para URLs repetidas (de archivos nuevos o ya existentes)
+    done_set = set(done)
+    for url, indices in duplicates.items():
+        source = os.path.join(OUTPUT_FOLDER, f"{first_index[url]:02d}.mp3")
+        for i in indices:
+            if first_index[url] in done_set:
+                shutil.copyfile(source, os.path.join(OUTPUT_FOLDER, f"{i:02d}.mp3"))
+                print(f"  ✅ {i:02d}.mp3 (copia de {first_index[url]:02d}.mp3)")
+                success += 1
+                done.append(i)
+            else:
+                failed += 1
+    
+    save_manifest(OUTPUT_FOLDER, {f"{i:02d}.mp3": urls[i - 1] for i in sorted(done)})
     
     # Resumen
     print("\n" + "=" * 50)
@@ -4,13 +4,20 @@ Optimized video generation with caching and incremental processing
 import os
 import json
 import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set
 from pathlib import Path
 
-from config import MEDIA_ASSIGNMENT_JSON, PROCESSED_FOLDER, OUTPUT_VIDEO_FOLDER, CHECKPOINT_FILE
-from utils import setup_logging
+from config import (
+    MEDIA_ASSIGNMENT_JSON, PROCESSED_FOLDER, OUTPUT_VIDEO_FOLDER, CHECKPOINT_FILE,
+    PROCESSED_INDEX_JSON
+)
+from utils import setup_logging, prefetch_files
 from checkpoint import CheckpointManager
+from processed_index import ProcessedIndex
 
 
 def get_processed_clips() -> Dict[str, str]:
@@ -23,13 +30,14 @@ def get_processed_clips() -> Dict[str, str]:
     if not os.path.exists(PROCESSED_FOLDER):
         return processed
     
-    for filename in os.listdir(PROCESSED_FOLDER):
-        if filename.endswith('.mp4') and not filename.startswith('separator_'):
-            # Extract original filename from processed name (format: XXXX_originalname.mp4)
-            if '_' in filename:
-                original_part = '_'.join(filename.split('_')[1:])
-                original_name = original_part.replace('.mp4', '')
-                processed[original_name] = os.path.join(PROCESSED_FOLDER, filename)
+    with os.scandir(PROCESSED_FOLDER) as entries:
+        for entry in entries:
+            filename = entry.name
+            if filename[-4:] == '.mp4' and not filename.startswith('separator_'):
+                # Extract original filename from processed name (format: XXXX_originalname.mp4)
+                sep = filename.find('_')
+                if sep != -1:
+                    processed[filename[sep + 1:-4]] = entry.path
     
     return processed
 
@@ -45,7 +53,7 @@ def should_process_clip(media_info: Dict, processed_clips: Dict[str, str]) -> bo
     Returns:
         True if needs processing, False if can skip
     """
-    filename_base = os.path.splitext(media_info['filename'])[0]
+    filename_base = media_info['_base']
     
     # Check if already processed
     if filename_base in processed_clips:
@@ -58,31 +66,34 @@ def should_process_clip(media_info: Dict, processed_clips: Dict[str, str]) -> bo
     return True  # Needs processing
 
 
-def generate_month_video(month: int, assignments: Dict, generator, output_path: str, all_assignments: Dict) -> str:
+def generate_month_video(month: int, month_dates: List[str], assignments: Dict, generator,
+                         output_path: str, all_assignments: Dict,
+                         processed_clips: ProcessedIndex, executor=None, threads: Optional[int] = None) -> str:
     """
     Generate video for a single month
     
     Args:
         month: Month number (1-12)
+        month_dates: Sorted date keys (YYYY-MM-DD) of this month that have media
         assignments: Month-specific media assignments
         generator: VideoGenerator instance
         output_path: Where to save month video
         all_assignments: Full year assignments (for context)
+        processed_clips: Index of already processed clips; newly processed clips are added to it
+        executor: Shared clip-processing pool (see generate_video.create_process_pool)
+        threads: ffmpeg thread budget for the month compile (defaults to all cores)
         
     Returns:
         Path to generated month video
     """
     from config import MONTH_NAMES
+    from generate_video import process_media_files
     
     logging.info(f"\n{'='*60}")
     logging.info(f"📅 Procesando {MONTH_NAMES[month-1]} (Mes {month}/12)")
     logging.info(f"{'='*60}")
 
     
-    # Filter assignments for this month
-    month_dates = [d for d in sorted(assignments.keys()) 
-                   if d.startswith(f"2025-{month:02d}")]
-    
     if not month_dates:
         logging.info(f"No media for {MONTH_NAMES[month-1]}, skipping...")
         return None
@@ -90,84 +101,49 @@ def generate_month_video(month: int, assignments: Dict, generator, output_path:
     logging.info(f"Found {len(month_dates)} days with media")
     
     # Month separator
-    separator_path = os.path.join(PROCESSED_FOLDER, f"separator_{month:02d}.mp4")
+    separator_path = generator.separator_path(month)
     if not os.path.exists(separator_path):
         generator.create_month_separator(month, separator_path)
-    month_clips = [separator_path]
-    month_clip_dates = [None]
-    
-    # Get already processed clips (search by filename, not index)
-    processed_clips_cache = get_processed_clips()
+    # (clip path, caption date, needs normalizing); separators are created at the output format
+    month_clip_list = [(separator_path, None, False)]
     
     # Process media for this month
+    # Collect the uncached files first so they can be encoded in parallel
+    tasks = []
+    month_media = []  # (date, media info, source filename base) in order
     clip_index = (month - 1) * 1000
     
     for date_str in month_dates:
-        media_list = assignments[date_str]
-        
-        for media_info in media_list:
-            filename_base = os.path.splitext(media_info['filename'])[0]
+        for media_info in assignments[date_str]:
+            filename_base = media_info['_base']
+            month_media.append((date_str, media_info, filename_base))
             
             # Check if already processed (search by filename, ignore index)
-            if filename_base in processed_clips_cache:
+            if filename_base in processed_clips:
                 # Reuse existing processed clip regardless of its original index
-                processed_clip = processed_clips_cache[filename_base]
-                logging.info(f"Using cached: {media_info['filename']} -> {os.path.basename(processed_clip)}")
+                logging.info(f"Using cached: {media_info['filename']} -> {os.path.basename(processed_clips.get(filename_base))}")
             else:
                 # Need to process this file
                 logging.info(f"Processing: {media_info['filename']}")
-                processed_clip = generator.process_media_file(media_info, clip_index)
-            
-            if processed_clip:
-                month_clips.append(processed_clip)
-                month_clip_dates.append(date_str)
-                clip_index += 1
-    
-    # Videos need normalization, images are already pre-normalized
-    # Add captions to all clips - IMPORTANT: Copy to temp first to avoid modifying cached clips!
-    logging.info(f"\nPreparing {len(month_clips)-1} clips for {MONTH_NAMES[month-1]}...")
-    
-    from config import TEMP_FOLDER
-    import shutil
-    month_temp_folder = os.path.join(TEMP_FOLDER, f"month_{month:02d}")
-    os.makedirs(month_temp_folder, exist_ok=True)
-    
-    # Create working copies with captions
-    final_clips_for_month = [month_clips[0]]  # Keep separator as-is
-    
-    for i in range(1, len(month_clips)):
-        clip = month_clips[i]
-        date_str = month_clip_dates[i]
-        
-        if not date_str:
-            final_clips_for_month.append(clip)
-            continue
-        
-        # Find original media type to know if normalization is needed
-        media_info = None
-        for m in assignments[date_str]:
-            if os.path.basename(clip).endswith(f"_{os.path.splitext(m['filename'])[0]}.mp4"):
-                media_info = m
-                break
-        
-        # Copy to temp folder to avoid modifying cached processed clips
-        temp_clip_name = f"{i:04d}_{os.path.basename(clip)}"
-        temp_clip_path = os.path.join(month_temp_folder, temp_clip_name)
-        shutil.copy2(clip, temp_clip_path)
-        
-        # Only normalize videos/GIFs (images are pre-normalized)
-        if media_info and media_info['type'] in ['video', 'gif']:
-            logging.debug(f"Normalizing: {os.path.basename(clip)}")
-            generator.normalize_clip(temp_clip_path)
-        
-        # Add caption with CURRENT date (not cached date)
-        generator.add_date_caption(temp_clip_path, date_str)
-        
-        final_clips_for_month.append(temp_clip_path)
+                tasks.append((media_info, clip_index, filename_base))
+            clip_index += 1
+    
+    task_args = [(media_info, index) for media_info, index, _ in tasks]
+    for (_, _, filename_base), processed_clip in zip(tasks, process_media_files(task_args, executor=executor)):
+        if processed_clip:
+            processed_clips.add(filename_base, processed_clip)
+    
+    for date_str, media_info, filename_base in month_media:
+        processed_clip = processed_clips.get(filename_base)
+        if processed_clip:
+            # Only videos/GIFs need normalization (images are pre-normalized)
+            needs_normalize = media_info['type'] in ('video', 'gif')
+            month_clip_list.append((processed_clip, date_str, needs_normalize))
     
-    # Compile month video
-    logging.info(f"Compiling {MONTH_NAMES[month-1]} video ({len(final_clips_for_month)-1} clips)...")
-    generator.compile_final_video(final_clips_for_month, output_path)
+    # Normalize, caption (with CURRENT date, not cached date) and concatenate in
+    # one ffmpeg pass; cached clips are only read, never modified
+    logging.info(f"Compiling {MONTH_NAMES[month-1]} video ({len(month_clip_list)-1} clips)...")
+    generator.compile_captioned_video(month_clip_list, output_path, threads=threads)
     
     return output_path
 
@@ -175,8 +151,8 @@ def generate_month_video(month: int, assignments: Dict, generator, output_path:
 def generate_optimized(checkpoint_manager: CheckpointManager = None):
     """Generate video with all optimizations and checkpoint support"""
     setup_logging("INFO")
-    from generate_video import VideoGenerator
-    from config import MONTH_NAMES, FINAL_VIDEO
+    from generate_video import VideoGenerator, create_process_pool
+    from config import MONTH_NAMES, FINAL_VIDEO, ENCODE_WORKERS, MONTH_WORKERS
     
     # Initialize checkpoint manager if not provided
     if checkpoint_manager is None:
@@ -190,10 +166,20 @@ def generate_optimized(checkpoint_manager: CheckpointManager = None):
     # Load assignments
     assignments = generator.load_assignments()
     
+    # Bucket dates by month once (sorted), instead of filtering the full key set per month
+    by_month = defaultdict(list)
+    for date_key in sorted(assignments):
+        by_month[int(date_key[5:7])].append(date_key)
+    
     # Generate video for each month
-    month_videos = []
+    month_videos = {}
     completed_months = checkpoint_manager.get_completed_months()
     
+    # Load the processed clip index (search by filename, not index); the folder
+    # is only rescanned when the index is missing or stale
+    processed_clips = ProcessedIndex(PROCESSED_INDEX_JSON, get_processed_clips)
+    
+    pending_months = []
     for month in range(1, 13):
         month_output = os.path.join(OUTPUT_VIDEO_FOLDER, f"month_{month:02d}_{MONTH_NAMES[month-1]}.mp4")
         
@@ -202,14 +188,75 @@ def generate_optimized(checkpoint_manager: CheckpointManager = None):
             logging.info(f"\n{'='*60}")
             logging.info(f"Skipping {MONTH_NAMES[month-1]} (already processed)")
             logging.info(f"{'='*60}")
-            month_videos.append(month_output)
+            month_videos[month] = month_output
             continue
         
-        month_video = generate_month_video(month, assignments, generator, month_output, assignments)
-        
-        if month_video:
-            month_videos.append(month_video)
-            checkpoint_manager.mark_month_complete(month)
+        pending_months.append((month, month_output))
+    
+    # Warm the page cache with the pending months' inputs (cached clips or source
+    # files) a month ahead of the encoders, so the next month reads from memory
+    # without the whole year evicting the files currently being encoded
+    def prefetch_month(month):
+        for date_str in by_month.get(month, []):
+            prefetch_files(
+                processed_clips.get(m['_base']) or m['filepath']
+                for m in assignments[date_str]
+            )
+    
+    upcoming = iter(pending_months)
+    
+    def prefetch_next():
+        pending = next(upcoming, None)
+        if pending:
+            threading.Thread(target=prefetch_month, args=(pending[0],), daemon=True).start()
+    
+    for _ in range(MONTH_WORKERS + 1):
+        prefetch_next()
+    
+    # Render the missing month separators up front with one ffmpeg process
+    separators = [
+        (month, generator.separator_path(month))
+        for month, _ in pending_months if by_month.get(month)
+    ]
+    generator.create_month_separators(
+        [(month, path) for month, path in separators if not os.path.exists(path)]
+    )
+    
+    # Months are independent: run them concurrently. Their ffmpeg jobs run as
+    # subprocesses, so threads are enough here; per-clip encodes share one process pool
+    pool = create_process_pool() if ENCODE_WORKERS > 1 else None
+    
+    # Each concurrent month compile gets its share of the cores, so they don't
+    # each spawn a full set of ffmpeg threads on top of one another
+    concurrent_months = max(1, min(MONTH_WORKERS, len(pending_months)))
+    month_threads = max(1, (os.cpu_count() or 1) // concurrent_months)
+    try:
+        with ThreadPoolExecutor(max_workers=MONTH_WORKERS) as month_executor:
+            futures = {
+                month_executor.submit(generate_month_video, month, by_month.get(month, []),
+                                      assignments, generator, month_output, assignments,
+                                      processed_clips, pool, month_threads): month
+                for month, month_output in pending_months
+            }
+            
+            # Checkpoint from this thread only, as each month finishes
+            for future in as_completed(futures):
+                month = futures[future]
+                month_video = future.result()
+                
+                # A worker is free for the next month: keep the prefetch window moving
+                prefetch_next()
+                
+                if month_video:
+                    month_videos[month] = month_video
+                    processed_clips.save()
+                    checkpoint_manager.mark_month_complete(month)
+                    checkpoint_manager.flush()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    
+    month_videos = [month_videos[month] for month in sorted(month_videos)]
     
     # Concatenate all month videos
     logging.info(f"\n{'='*60}")
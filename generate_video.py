@@ -7,10 +7,14 @@ import json
 import subprocess
 import shutil
 import random
+import re
+import hashlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime, date, timedelta
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple, Union
 import logging
-from pathlib import Path
 
 from PIL import Image, ImageDraw, ImageFont
 import ffmpeg
@@ -20,14 +24,180 @@ from config import (
     MEDIA_ASSIGNMENT_JSON, FINAL_VIDEO, TARGET_YEAR,
     VIDEO_SETTINGS, PHOTO_DURATION, VIDEO_DURATION, GIF_MAX_DURATION,
     MONTH_SEPARATOR_DURATION, FADE_DURATION, KEN_BURNS, MONTH_SEPARATOR,
-    MONTH_NAMES, LOG_LEVEL
+    MONTH_NAMES, LOG_LEVEL, ENCODE_WORKERS, KEN_BURNS_BATCH_SIZE, COMPILE_MAX_INPUTS
 )
 from utils import (
     setup_logging, ensure_dir_exists, is_image, is_video, is_gif,
-    format_duration
+    format_duration, detect_hw_encoder, detect_hw_decoder
 )
 
 
+# Fonts to try for month separators (in order of preference)
+SEPARATOR_FONTS = [
+    # Windows
+    "arial.ttf",
+    "Arial.ttf",
+    # Linux common locations
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "/usr/share/fonts/truetype/freefont/FreeSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf",  # Arch Linux
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    # Ubuntu/Debian
+    "/usr/share/fonts/truetype/ubuntu/Ubuntu-Bold.ttf",
+    "/usr/share/fonts/truetype/ubuntu/Ubuntu-Regular.ttf",
+]
+
+# Regular-weight fonts for date captions, by absolute path so ffmpeg's drawtext
+# can open them directly (if none exists, fontconfig picks the default font)
+CAPTION_FONTS = [
+    # Windows
+    "C:/Windows/Fonts/arial.ttf",
+    # Linux common locations
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "/usr/share/fonts/truetype/freefont/FreeSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",  # Arch Linux
+    # Ubuntu/Debian
+    "/usr/share/fonts/truetype/ubuntu/Ubuntu-Regular.ttf",
+]
+
+
+@lru_cache(maxsize=4)
+def _load_font(font_size: int) -> ImageFont.ImageFont:
+    """
+    Load the first available separator font (try multiple locations for
+    cross-platform compatibility)
+    
+    Args:
+        font_size: Font size in pixels
+        
+    Returns:
+        Loaded font, or PIL's default font if no TTF font was found
+    """
+    for font_path in SEPARATOR_FONTS:
+        try:
+            font = ImageFont.truetype(font_path, font_size)
+            logging.debug(f"Using font: {font_path}")
+            return font
+        except OSError:
+            continue
+    
+    # Ultimate fallback - use default with warning
+    logging.warning("No TTF font found, using default (text may appear small)")
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=1)
+def _caption_font_file() -> Optional[str]:
+    """
+    Path of the first available date caption font
+    
+    Returns:
+        Font file path, or None to leave the choice to fontconfig
+    """
+    for font_path in CAPTION_FONTS:
+        if os.path.isfile(font_path):
+            return font_path
+    return None
+
+
+@lru_cache(maxsize=None)
+def _probe_cached(path: str, mtime_ns: int) -> Dict:
+    """ffprobe result for one version (mtime) of a file"""
+    return ffmpeg.probe(path)
+
+
+def probe_media(path: str) -> Dict:
+    """
+    ffprobe a media file, reusing the result while the file is unchanged
+    
+    Args:
+        path: Media file path
+        
+    Returns:
+        ffprobe result dictionary
+    """
+    return _probe_cached(path, os.stat(path).st_mtime_ns)
+
+
+# Keep ffmpeg quiet: no banner or progress, only errors on stderr
+FFMPEG_QUIET_ARGS = ['-hide_banner', '-loglevel', 'error', '-nostats']
+
+
+def run_ffmpeg(cmd: List[str], input: Optional[bytes] = None):
+    """
+    Run an ffmpeg command quietly
+    
+    stdout is discarded and stderr only carries errors, so nothing large is
+    buffered for successful runs; on failure the errors are logged.
+    
+    Args:
+        cmd: ffmpeg command ('ffmpeg' followed by its arguments)
+        input: Bytes to feed on stdin, if any
+        
+    Raises:
+        subprocess.CalledProcessError: If ffmpeg exits with an error
+    """
+    try:
+        subprocess.run([cmd[0], *FFMPEG_QUIET_ARGS, *cmd[1:]], input=input, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except subprocess.CalledProcessError as e:
+        logging.error(f"ffmpeg failed: {e.stderr.decode(errors='replace').strip() if e.stderr else e}")
+        raise
+
+
+def escape_filter_value(value: str) -> str:
+    """
+    Escape a value (e.g. a file path) for use as a filter option in a filtergraph
+    
+    Applies both escaping levels ffmpeg parses: the filter option level and
+    the filtergraph level.
+    
+    Args:
+        value: Raw option value
+        
+    Returns:
+        Escaped value
+    """
+    value = value.replace('\\', '/')  # ffmpeg accepts forward slashes on Windows too
+    value = re.sub(r"([\\':])", r"\\\1", value)
+    return re.sub(r"([\\'\[\],;])", r"\\\1", value)
+
+
+def resolve_hw_encoder() -> Optional[str]:
+    """
+    Hardware encoder selected by VIDEO_SETTINGS['hw_encoder']
+    
+    Returns:
+        Encoder name, or None when clips are encoded in software
+    """
+    hw_encoder = VIDEO_SETTINGS.get('hw_encoder', 'none')
+    if hw_encoder == 'auto':
+        hw_encoder = detect_hw_encoder()
+    return hw_encoder if hw_encoder and hw_encoder != 'none' else None
+
+
+def as_kwargs(args: List[str]) -> Dict[str, str]:
+    """Turn a flat ['-flag', 'value', ...] option list into ffmpeg-python keyword arguments"""
+    return {flag.lstrip('-'): value for flag, value in zip(args[::2], args[1::2])}
+
+
+# EXIF orientation tag and the ffmpeg filters that undo each orientation value
+EXIF_ORIENTATION_TAG = 0x0112
+EXIF_ORIENTATION_FILTERS = {
+    2: ('hflip',),
+    3: ('hflip', 'vflip'),
+    4: ('vflip',),
+    5: ('transpose=0',),  # Transpose
+    6: ('transpose=1',),  # Rotate 90° clockwise
+    7: ('transpose=3',),  # Transverse
+    8: ('transpose=2',),  # Rotate 90° counter-clockwise
+}
+
+
 class VideoGenerator:
     """Main video generation class"""
     
@@ -40,6 +210,87 @@ class VideoGenerator:
         ensure_dir_exists(PROCESSED_FOLDER)
         ensure_dir_exists(TEMP_FOLDER)
     
+    def encoder_args(self, preset: Optional[str] = None) -> List[str]:
+        """
+        ffmpeg video encoder options for the heavy re-encode passes
+        
+        Uses a hardware encoder when VIDEO_SETTINGS['hw_encoder'] allows it and
+        one is available, falling back to the configured software codec. The
+        profile, level and a closed, fixed one-second GOP are pinned so that every
+        clip carries the same stream parameters, starts on an IDR frame and can
+        be joined by stream copy; so is the MP4 track timescale.
+        
+        Args:
+            preset: Software encoder preset override (e.g. 'ultrafast' for
+                    intermediate files); defaults to VIDEO_SETTINGS['preset']
+        
+        Returns:
+            List of ffmpeg arguments (codec, rate control and track timescale)
+        """
+        hw_encoder = resolve_hw_encoder()
+        gop = str(self.fps)
+        
+        if hw_encoder == 'h264_nvenc':
+            args = ['-c:v', 'h264_nvenc', '-preset', 'p4', '-tune', 'hq',
+                    '-rc', 'vbr', '-cq', str(VIDEO_SETTINGS['crf']), '-b:v', '8M',
+                    '-profile:v', 'high', '-g', gop, '-forced-idr', '1']
+        elif hw_encoder == 'hevc_nvenc':
+            # Opt-in only (never picked by 'auto'); hvc1 tag so Apple players accept it
+            args = ['-c:v', 'hevc_nvenc', '-preset', 'p4', '-tune', 'hq',
+                    '-rc', 'vbr', '-cq', str(VIDEO_SETTINGS['crf']), '-b:v', '6M',
+                    '-profile:v', 'main', '-g', gop, '-forced-idr', '1', '-tag:v', 'hvc1']
+        elif hw_encoder == 'h264_videotoolbox':
+            args = ['-c:v', 'h264_videotoolbox', '-b:v', '8M', '-profile:v', 'high', '-g', gop]
+        elif hw_encoder:
+            args = ['-c:v', hw_encoder, '-b:v', '8M', '-g', gop]
+        else:
+            args = [
+                '-c:v', VIDEO_SETTINGS['video_codec'],
+                '-crf', str(VIDEO_SETTINGS['crf']),
+                '-preset', preset or VIDEO_SETTINGS['preset'],
+                '-profile:v', 'high',
+                '-level', '4.0',
+            ]
+            if VIDEO_SETTINGS['video_codec'] == 'libx264':
+                args += ['-x264-params', f'keyint={gop}:min-keyint={gop}:scenecut=0:open-gop=0']
+            else:
+                args += ['-g', gop]
+        
+        # Same MP4 track time base for every clip, whichever encoder made it
+        return args + ['-video_track_timescale', str(self.fps * 512)]
+    
+    def decoder_args(self) -> List[str]:
+        """
+        ffmpeg input options to decode source videos on the GPU
+        
+        Decoded frames are copied back to system memory, so the usual CPU
+        scale/pad filters still apply.
+        
+        Returns:
+            ['-hwaccel', name] or an empty list for software decoding
+        """
+        if not VIDEO_SETTINGS.get('hw_decode') or VIDEO_SETTINGS.get('hw_encoder', 'none') == 'none':
+            return []
+        hwaccel = detect_hw_decoder()
+        return ['-hwaccel', hwaccel] if hwaccel else []
+    
+    def thread_args(self, threads: Optional[int] = None) -> List[str]:
+        """
+        ffmpeg options for encoding and filtering threads
+        
+        Args:
+            threads: Thread budget for this ffmpeg (e.g. its share of the cores
+                     when several run at once); defaults to all cores
+        
+        Returns:
+            List of ffmpeg arguments
+        """
+        if threads is None:
+            filter_threads = str(os.cpu_count() or 1)
+            return ['-threads', '0', '-filter_threads', filter_threads, '-filter_complex_threads', filter_threads]
+        threads = str(threads)
+        return ['-threads', threads, '-filter_threads', threads, '-filter_complex_threads', threads]
+    
     def load_assignments(self) -> Dict[str, List[Dict]]:
         """Load media assignments from JSON"""
         if not os.path.exists(MEDIA_ASSIGNMENT_JSON):
@@ -49,10 +300,28 @@ class VideoGenerator:
             )
         
         with open(MEDIA_ASSIGNMENT_JSON, 'r', encoding='utf-8') as f:
-            return json.load(f)
+            assignments = json.load(f)
+        
+        # Source filename without extension, used as the processed-clip cache key
+        for media_list in assignments.values():
+            for media_info in media_list:
+                media_info['_base'] = os.path.splitext(media_info['filename'])[0]
+        
+        return assignments
     
-    def convert_heic_to_jpg(self, heic_path: str) -> str:
-        """Convert HEIC to JPG for processing"""
+    def convert_heic(self, heic_path: str) -> Image.Image:
+        """
+        Decode a HEIC photo into an upright RGB image for processing
+        
+        The image is kept in memory and piped to ffmpeg, instead of being
+        written out as a temporary JPEG and decoded again.
+        
+        Args:
+            heic_path: HEIC file path
+            
+        Returns:
+            RGB image with EXIF orientation applied
+        """
         try:
             from pillow_heif import register_heif_opener
             from PIL import ImageOps
@@ -63,125 +332,255 @@ class VideoGenerator:
             # Fix orientation based on EXIF data (prevents rotation issues)
             img = ImageOps.exif_transpose(img)
             
-            jpg_path = heic_path.replace('.HEIC', '.jpg').replace('.heic', '.jpg')
-            jpg_path = os.path.join(TEMP_FOLDER, os.path.basename(jpg_path))
-            
             # Convert to RGB if needed
             if img.mode in ('RGBA', 'LA', 'P'):
                 background = Image.new('RGB', img.size, (255, 255, 255))
                 if img.mode == 'P':
                     img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+                # Only the alpha band is extracted (split() would copy every band)
+                background.paste(img, mask=img.getchannel('A'))
                 img = background
             elif img.mode != 'RGB':
                 img = img.convert('RGB')
             
-            img.save(jpg_path, 'JPEG', quality=95)
-            return jpg_path
+            return img
         except Exception as e:
             logging.error(f"Error converting HEIC: {e}")
             raise
     
-    def create_ken_burns_image(self, input_path: str, output_path: str, 
-                               duration: float, zoom_in: bool = True) -> str:
+    def _letterbox_image(self, image: Union[str, Image.Image]) -> Image.Image:
+        """
+        Load an image with PIL and letterbox it onto a black output-sized canvas
+        
+        Used for images ffmpeg can't letterbox faithfully on its own
+        (transparency, palette, CMYK, decoded HEIC).
+        
+        Args:
+            image: Input image path or already decoded image
+            
+        Returns:
+            RGB image at the output resolution
+        """
+        from PIL import ImageOps
+        
+        # Load and fix orientation
+        img = Image.open(image) if isinstance(image, str) else image
+        if img.format == 'JPEG':
+            # Decode at a reduced DCT scale; still at least 2x the output size
+            # so the LANCZOS downscale below keeps full quality
+            img.draft('RGB', (self.width * 2, self.height * 2))
+        img = ImageOps.exif_transpose(img)
+        
+        # Convert to RGB if needed
+        if img.mode in('RGBA', 'LA', 'P'):
+            background = Image.new('RGB', img.size, (0, 0, 0))
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            # Only the alpha band is extracted (split() would copy every band)
+            background.paste(img, mask=img.getchannel('A'))
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+        
+        # Resize to fit 16:9 with letterboxing (BLACK BARS, NO STRETCHING)
+        img_ratio = img.width / img.height
+        target_ratio = self.width / self.height
+        
+        if img_ratio > target_ratio:
+            # Image is wider - fit by width
+            new_width = self.width
+            new_height = int(self.width / img_ratio)
+        else:
+            # Image is taller/vertical - fit by height
+            new_height = self.height
+            new_width = int(self.height * img_ratio)
+        
+        if img.size != (new_width, new_height):
+            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        
+        # Already fills the frame (same aspect ratio): no bars to add
+        if img.size == (self.width, self.height):
+            return img
+        
+        # Create black canvas and paste image centered
+        canvas = Image.new('RGB', (self.width, self.height), (0, 0, 0))
+        x_offset = (self.width - new_width) // 2
+        y_offset = (self.height - new_height) // 2
+        canvas.paste(img, (x_offset, y_offset))
+        return canvas
+    
+    def _raw_input_args(self) -> List[str]:
+        """ffmpeg input options for one output-sized RGB frame piped on stdin"""
+        return [
+            '-f', 'rawvideo',
+            '-pix_fmt', 'rgb24',
+            '-s', f'{self.width}x{self.height}',
+            '-framerate', str(self.fps),
+            '-i', '-'
+        ]
+    
+    def _image_input(self, input_path: Union[str, Image.Image]) -> Tuple[List[str], List[str], Optional[bytes]]:
+        """
+        Decide how an image is fed to ffmpeg
+        
+        Plain RGB/grayscale images are read by ffmpeg directly and letterboxed in
+        the same filter graph as the effect (EXIF orientation is applied with
+        transpose/flip filters). Anything else is flattened with PIL and piped
+        to ffmpeg as a raw letterboxed RGB frame.
+        
+        Args:
+            input_path: Input image path or already decoded image
+            
+        Returns:
+            Tuple of (ffmpeg input options, filters to prepend, raw frame for stdin or None)
+        """
+        if isinstance(input_path, Image.Image):
+            return self._raw_input_args(), [], self._letterbox_image(input_path).tobytes()
+        
+        with Image.open(input_path) as img:
+            direct = img.mode in ('RGB', 'L')
+            orientation = img.getexif().get(EXIF_ORIENTATION_TAG, 1) if direct else 1
+            width, height = img.size
+        
+        if direct:
+            filters = list(EXIF_ORIENTATION_FILTERS.get(orientation, ()))
+            if orientation >= 5:
+                width, height = height, width  # Transposed
+            if (width, height) != (self.width, self.height):
+                # Images already at the output size need neither scaling nor bars
+                filters += [
+                    f"scale={self.width}:{self.height}:force_original_aspect_ratio=decrease:flags=lanczos",
+                    f"pad={self.width}:{self.height}:(ow-iw)/2:(oh-ih)/2:color=black",
+                ]
+            filters.append("setsar=1")
+            # Orientation is handled by the filters above
+            return ['-autorotate', '0', '-i', input_path], filters, None
+        
+        return self._raw_input_args(), [], self._letterbox_image(input_path).tobytes()
+    
+    def _zoompan_filter(self, frames: int, zoom_in: bool) -> str:
+        """
+        Build the Ken Burns zoompan filter
+        
+        Args:
+            frames: Number of output frames
+            zoom_in: True for zoom in, False for zoom out
+            
+        Returns:
+            zoompan filter string
+        """
+        zoom_start, zoom_end = KEN_BURNS['zoom_range']
+        if not zoom_in:
+            zoom_start, zoom_end = zoom_end, zoom_start
+        step = (zoom_end - zoom_start) / frames
+        zoom_min, zoom_max = min(zoom_start, zoom_end), max(zoom_start, zoom_end)
+        
+        # zoompan emits all `frames` output frames from the single decoded
+        # image (d=frames), so the source is decoded and scaled only once
+        # The zoom is affine in the output frame number (on), with the step
+        # precomputed here; the clamp holds the start zoom for frames 0 and 1
+        return (
+            f"zoompan=z='min(max({zoom_start}+{step:.8f}*(on-1),{zoom_min}),{zoom_max})':"
+            f"d={frames}:"
+            f"x='(iw-iw/zoom)/2':"
+            f"y='(ih-ih/zoom)/2':"
+            f"s={self.width}x{self.height}:"
+            f"fps={self.fps}"
+        )
+    
+    def create_ken_burns_batch(self, jobs: List[Tuple[str, str, bool]], duration: float):
+        """
+        Apply Ken Burns effect to several images with a single ffmpeg process
+        
+        Each image is an input of one filter graph with its own output file, so
+        process startup, probing and filter graph setup are paid once per batch
+        instead of once per photo.
+        
+        Args:
+            jobs: List of (input_path, output_path, zoom_in, caption date or None)
+                  tuples (no HEIC)
+            duration: Duration of every clip in seconds
+            
+        Raises:
+            subprocess.CalledProcessError: If ffmpeg fails (no output is reliable)
+        """
+        frames = int(duration * self.fps)
+        inputs = []
+        graph = []
+        outputs = []
+        frame = None
+        leftovers = []
+        for input_path, output_path, zoom_in, date_str in jobs:
+            input_args, filters, raw = self._image_input(input_path)
+            if raw is not None:
+                if frame is not None:
+                    # Only one raw frame fits on stdin; render this one on its own
+                    leftovers.append((input_path, output_path, zoom_in, date_str))
+                    continue
+                frame = raw
+            
+            i = len(graph)
+            inputs += input_args
+            filters = filters + [self._zoompan_filter(frames, zoom_in)] + self._caption_filters(date_str)
+            graph.append(f"[{i}:v]{','.join(filters)}[v{i}]")
+            outputs += [
+                '-map', f'[v{i}]',
+                '-frames:v', str(frames),
+                *self.encoder_args(),
+                '-pix_fmt', VIDEO_SETTINGS['pixel_format'],
+                '-r', str(self.fps),
+                output_path
+            ]
+        
+        if graph:
+            cmd = ['ffmpeg', '-y', *inputs, '-filter_complex', ';'.join(graph), *outputs]
+            run_ffmpeg(cmd, input=frame)
+        
+        for input_path, output_path, zoom_in, date_str in leftovers:
+            self.create_ken_burns_image(input_path, output_path, duration, zoom_in, date_str)
+    
+    def create_ken_burns_image(self, input_path: Union[str, Image.Image], output_path: str, 
+                               duration: float, zoom_in: bool = True,
+                               date_str: Optional[str] = None) -> str:
         """
         Apply Ken Burns effect to an image using FFmpeg
-        First creates letterboxed image, then applies zoom
+        Letterboxes and zooms in a single ffmpeg pass
         
         Args:
-            input_path: Input image path
+            input_path: Input image path or decoded image
             output_path: Output video path
             duration: Duration in seconds
             zoom_in: True for zoom in, False for zoom out
+            date_str: Date to caption the clip with (YYYY-MM-DD), if any
             
         Returns:
             Path to output video
         """
         try:
-            # Convert HEIC to JPG if needed
-            if input_path.lower().endswith('.heic'):
-                input_path = self.convert_heic_to_jpg(input_path)
-            
-            # Load and fix orientation
-            from PIL import ImageOps
-            img = Image.open(input_path)
-            img = ImageOps.exif_transpose(img)
-            
-            # Convert to RGB if needed
-            if img.mode in('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (0, 0, 0))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Resize to fit 16:9 with letterboxing (BLACK BARS, NO STRETCHING)
-            img_ratio = img.width / img.height
-            target_ratio = self.width / self.height
-            
-            if img_ratio > target_ratio:
-                # Image is wider - fit by width
-                new_width = self.width
-                new_height = int(self.width / img_ratio)
-            else:
-                # Image is taller/vertical - fit by height
-                new_height = self.height
-                new_width = int(self.height * img_ratio)
-            
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Create black canvas and paste image centered
-            canvas = Image.new('RGB', (self.width, self.height), (0, 0, 0))
-            x_offset = (self.width - new_width) // 2
-            y_offset = (self.height - new_height) // 2
-            canvas.paste(img, (x_offset, y_offset))
+            # Decode HEIC if needed
+            if isinstance(input_path, str) and input_path.lower().endswith('.heic'):
+                input_path = self.convert_heic(input_path)
             
-            # Save the letterboxed image
-            temp_letterbox_path = output_path.replace('.mp4', '_letterbox.jpg')
-            canvas.save(temp_letterbox_path, 'JPEG', quality=95)
+            input_args, filters, frame = self._image_input(input_path)
             
             # Now apply Ken Burns to the letterboxed image
-            zoom_start, zoom_end = KEN_BURNS['zoom_range']
-            if not zoom_in:
-                zoom_start, zoom_end = zoom_end, zoom_start
-            
             frames = int(duration * self.fps)
-            zoom_diff = zoom_end - zoom_start
-            
-            # Use zoompan filter on the already-letterboxed image
-            # Note: d=1 means each input frame produces 1 output frame
-            # The zoom expression calculates based on output frame number (on)
-            zoompan_filter = (
-                f"zoompan=z='if(lte(on,1),{zoom_start},{zoom_start}+{zoom_diff}*(on-1)/{frames})':"
-                f"d=1:"  # 1 output frame per zoompan iteration
-                f"x='(iw-iw/zoom)/2':"
-                f"y='(ih-ih/zoom)/2':"
-                f"s={self.width}x{self.height}:"
-                f"fps={self.fps}"
-            )
+            zoompan_filter = self._zoompan_filter(frames, zoom_in)
             
             # Build FFmpeg command with EXACT parameters (pre-normalized)
             cmd = [
                 'ffmpeg',
-                '-loop', '1',
-                '-i', temp_letterbox_path,
-                '-vf', zoompan_filter,
-                '-t', str(duration),
-                '-c:v', VIDEO_SETTINGS['video_codec'],
+                *input_args,
+                '-vf', ','.join(filters + [zoompan_filter] + self._caption_filters(date_str)),
+                '-frames:v', str(frames),
+                *self.encoder_args(),
                 '-pix_fmt', VIDEO_SETTINGS['pixel_format'],  # Force yuv420p
                 '-r', str(self.fps),  # Force exact 30 fps
-                '-crf', str(VIDEO_SETTINGS['crf']),
                 '-y',
                 output_path
             ]
             
-            subprocess.run(cmd, check=True, capture_output=True)
-            
-            # Clean up temp letterbox image
-            if os.path.exists(temp_letterbox_path):
-                os.remove(temp_letterbox_path)
+            run_ffmpeg(cmd, input=frame)
             
             return output_path
             
@@ -189,84 +588,41 @@ class VideoGenerator:
             logging.error(f"Error creating Ken Burns effect: {e}")
             logging.warning("Falling back to static video without Ken Burns effect")
             # Fallback: create static video
-            return self.create_static_image_video(input_path, output_path, duration)
+            return self.create_static_image_video(input_path, output_path, duration, date_str)
     
-    def create_static_image_video(self, input_path: str, output_path: str, 
-                                  duration: float) -> str:
+    def create_static_image_video(self, input_path: Union[str, Image.Image], output_path: str, 
+                                  duration: float, date_str: Optional[str] = None) -> str:
         """
         Convert image to video without Ken Burns effect (fallback)
         
         Args:
-            input_path: Input image path
+            input_path: Input image path or decoded image
             output_path: Output video path
             duration: Duration in seconds
+            date_str: Date to caption the clip with (YYYY-MM-DD), if any
             
         Returns:
             Path to output video
         """
         try:
-            from PIL import ImageOps
-            
             # Prepare image with padding to fit 16:9
-            img = Image.open(input_path)
-            
-            # Fix orientation based on EXIF data (prevents rotation issues)
-            img = ImageOps.exif_transpose(img)
-            
-            # Convert RGBA to RGB if needed
-            if img.mode in('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (0, 0, 0))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Resize to fit 16:9 with letterboxing
-            img_ratio = img.width / img.height
-            target_ratio = self.width / self.height
-            
-            if img_ratio > target_ratio:
-                # Fit by width
-                new_width = self.width
-                new_height = int(self.width / img_ratio)
-            else:
-                # Fit by height
-                new_height = self.height
-                new_width = int(self.height * img_ratio)
-            
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            canvas = self._letterbox_image(input_path)
             
-            # Create black canvas and paste image centered
-            canvas = Image.new('RGB', (self.width, self.height), (0, 0, 0))
-            x_offset = (self.width - new_width) // 2
-            y_offset = (self.height - new_height) // 2
-            canvas.paste(img, (x_offset, y_offset))
-            
-            # Save temporary processed image
-            temp_img_path = output_path.replace('.mp4', '_temp.jpg')
-            canvas.save(temp_img_path, 'JPEG', quality=95)
-            
-            # Convert to video with EXACT parameters (pre-normalized)
+            # Convert to video with EXACT parameters (pre-normalized); the raw
+            # frame is piped on stdin and repeated by the loop filter
             cmd = [
                 'ffmpeg',
-                '-loop', '1',
-                '-i', temp_img_path,
-                '-c:v', VIDEO_SETTINGS['video_codec'],
+                *self._raw_input_args(),
+                *self.encoder_args(),
                 '-t', str(duration),
                 '-pix_fmt', VIDEO_SETTINGS['pixel_format'],  # Force yuv420p
                 '-r', str(self.fps),  # Force exact 30 fps
-                '-vf', f'fps={self.fps}',
+                '-vf', ','.join([f'loop=loop=-1:size=1:start=0,fps={self.fps}'] + self._caption_filters(date_str)),
                 '-y',
                 output_path
             ]
             
-            subprocess.run(cmd, check=True, capture_output=True)
-            
-            # Clean up temp image
-            if os.path.exists(temp_img_path):
-                os.remove(temp_img_path)
+            run_ffmpeg(cmd, input=canvas.tobytes())
             
             return output_path
             
@@ -275,7 +631,7 @@ class VideoGenerator:
             raise
     
     def extract_video_clip(self, input_path: str, output_path: str, 
-                          duration: float) -> str:
+                          duration: float, date_str: Optional[str] = None) -> str:
         """
         Extract a random clip from video (max duration)
         
@@ -283,13 +639,14 @@ class VideoGenerator:
             input_path: Input video path
             output_path: Output video path
             duration: Maximum duration in seconds
+            date_str: Date to caption the clip with (YYYY-MM-DD), if any
             
         Returns:
             Path to output video
         """
         try:
             # Get video duration
-            probe = ffmpeg.probe(input_path)
+            probe = probe_media(input_path)
             video_duration = float(probe['format']['duration'])
             
             # If video is shorter than target, use whole video
@@ -302,29 +659,30 @@ class VideoGenerator:
                 start_time = random.uniform(0, max_start)
                 clip_duration = duration
             
-            # Check if video has audio
-            has_audio = any(stream['codec_type'] == 'audio' for stream in probe.get('streams', []))
-            
-            # Build output parameters - FORCE constant framerate to fix VFR issues
+            # Build output parameters - FORCE constant framerate to fix VFR issues.
+            # The clip's own sound is dropped (an). Month videos never carried it:
+            # each one opens with a silent separator, so the concat had no audio
+            # stream to keep. The recap's only soundtrack is the music that
+            # add_audio_to_recap.py adds, and video-only clips match the photo and
+            # separator clips, so the final concat can copy streams
             output_params = {
-                'vf': f'fps={self.fps},scale={self.width}:{self.height}:force_original_aspect_ratio=decrease,pad={self.width}:{self.height}:(ow-iw)/2:(oh-ih)/2',
-                'c:v': 'libx264',
-                'crf': VIDEO_SETTINGS['crf'],
-                'preset': VIDEO_SETTINGS['preset'],
+                'vf': ','.join([f'fps={self.fps},scale={self.width}:{self.height}:force_original_aspect_ratio=decrease,pad={self.width}:{self.height}:(ow-iw)/2:(oh-ih)/2,setsar=1'] + self._caption_filters(date_str)),
+                **as_kwargs(self.encoder_args()),
                 'pix_fmt': VIDEO_SETTINGS['pixel_format'],
-                'r': self.fps  # Force constant framerate (fixes iPhone VFR videos)
+                'r': self.fps,  # Force constant framerate (fixes iPhone VFR videos)
+                'an': None
             }
             
-            # Add audio parameters if audio exists
-            if has_audio:
-                output_params['c:a'] = 'aac'
-                output_params['b:a'] = '128k'
-            
-            # Extract clip and normalize to 16:9
+            # Extract clip and normalize to 16:9 (decoding on the GPU when available)
+            # ss is an input option, so ffmpeg seeks in the demuxer; with
+            # noaccurate_seek it starts at the keyframe before the random point
+            # instead of decoding and discarding frames up to it
             (
                 ffmpeg
-                .input(input_path, ss=start_time, t=clip_duration)
+                .input(input_path, ss=start_time, t=clip_duration, noaccurate_seek=None,
+                       **as_kwargs(self.decoder_args()))
                 .output(output_path, **output_params)
+                .global_args(*FFMPEG_QUIET_ARGS)
                 .overwrite_output()
                 .run(capture_stdout=True, capture_stderr=True)
             )
@@ -338,13 +696,14 @@ class VideoGenerator:
             logging.error(f"Error extracting video clip: {e}")
             raise
     
-    def process_gif(self, input_path: str, output_path: str) -> str:
+    def process_gif(self, input_path: str, output_path: str, date_str: Optional[str] = None) -> str:
         """
         Process GIF - convert to video, respect animation, limit duration
         
         Args:
             input_path: Input GIF path
             output_path: Output video path
+            date_str: Date to caption the clip with (YYYY-MM-DD), if any
             
         Returns:
             Path to output video
@@ -357,11 +716,12 @@ class VideoGenerator:
                 .output(
                     output_path,
                     t=GIF_MAX_DURATION,
-                    vf=f'scale={self.width}:{self.height}:force_original_aspect_ratio=decrease,pad={self.width}:{self.height}:(ow-iw)/2:(oh-ih)/2',
-                    **{'c:v': 'libx264'},
+                    vf=','.join([f'fps={self.fps},scale={self.width}:{self.height}:force_original_aspect_ratio=decrease,pad={self.width}:{self.height}:(ow-iw)/2:(oh-ih)/2,setsar=1'] + self._caption_filters(date_str)),
+                    **as_kwargs(self.encoder_args()),
                     pix_fmt=VIDEO_SETTINGS['pixel_format'],
-                    crf=VIDEO_SETTINGS['crf']
+                    r=self.fps
                 )
+                .global_args(*FFMPEG_QUIET_ARGS)
                 .overwrite_output()
                 .run(capture_stdout=True, capture_stderr=True)
             )
@@ -375,6 +735,68 @@ class VideoGenerator:
             logging.error(f"Error processing GIF: {e}")
             raise
     
+    def separator_path(self, month: int) -> str:
+        """
+        Cache path of a month separator
+        
+        The name carries a hash of everything that affects the rendered clip,
+        so an existing file can be reused as-is and a settings change gets a
+        fresh render.
+        
+        Args:
+            month: Month number (1-12)
+            
+        Returns:
+            Separator clip path in PROCESSED_FOLDER
+        """
+        key_source = repr((
+            month, MONTH_NAMES[month - 1], TARGET_YEAR, self.width, self.height, self.fps,
+            MONTH_SEPARATOR_DURATION, FADE_DURATION, sorted(MONTH_SEPARATOR.items()),
+            self.encoder_args(), VIDEO_SETTINGS['pixel_format']
+        ))
+        key = hashlib.sha1(key_source.encode('utf-8')).hexdigest()[:12]
+        return os.path.join(PROCESSED_FOLDER, f"separator_{month:02d}_{key}.mp4")
+    
+    def _separator_frame(self, month: int) -> Image.Image:
+        """
+        Render the month separator title card
+        
+        Args:
+            month: Month number (1-12)
+            
+        Returns:
+            RGB image at the output resolution
+        """
+        # Create image with month name
+        img = Image.new('RGB', (self.width, self.height), 
+                      MONTH_SEPARATOR['background_color'])
+        draw = ImageDraw.Draw(img)
+        
+        # Load font (cached: the same font serves every month)
+        font = _load_font(MONTH_SEPARATOR['font_size'])
+        
+        # Draw month name
+        month_text = MONTH_NAMES[month - 1]
+        if MONTH_SEPARATOR['show_year']:
+            month_text += f" {TARGET_YEAR}"
+        
+        # Center text
+        bbox = draw.textbbox((0, 0), month_text, font=font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        x = (self.width - text_width) // 2
+        y = (self.height - text_height) // 2
+        
+        draw.text((x, y), month_text, fill=MONTH_SEPARATOR['text_color'], font=font)
+        return img
+    
+    def _separator_fades(self) -> str:
+        """Fade in/out filters for a month separator"""
+        return (
+            f"fade=t=in:st=0:d={FADE_DURATION},"
+            f"fade=t=out:st={MONTH_SEPARATOR_DURATION - FADE_DURATION}:d={FADE_DURATION}"
+        )
+    
     def create_month_separator(self, month: int, output_path: str) -> str:
         """
         Create month separator video (fade in/out with month name)
@@ -387,85 +809,22 @@ class VideoGenerator:
             Path to output video
         """
         try:
-            # Create image with month name
-            img = Image.new('RGB', (self.width, self.height), 
-                          MONTH_SEPARATOR['background_color'])
-            draw = ImageDraw.Draw(img)
-            
-            # Load font (try multiple locations for cross-platform compatibility)
-            font = None
-            font_size = MONTH_SEPARATOR['font_size']
-            
-            # List of fonts to try (in order of preference)
-            font_options = [
-                # Windows
-                "arial.ttf",
-                "Arial.ttf",
-                # Linux common locations
-                "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-                "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-                "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
-                "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
-                "/usr/share/fonts/truetype/freefont/FreeSans.ttf",
-                "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf",  # Arch Linux
-                "/usr/share/fonts/TTF/DejaVuSans.ttf",
-                # Ubuntu/Debian
-                "/usr/share/fonts/truetype/ubuntu/Ubuntu-Bold.ttf",
-                "/usr/share/fonts/truetype/ubuntu/Ubuntu-Regular.ttf",
-            ]
-            
-            for font_path in font_options:
-                try:
-                    font = ImageFont.truetype(font_path, font_size)
-                    logging.debug(f"Using font: {font_path}")
-                    break
-                except:
-                    continue
-            
-            # Ultimate fallback - use default with warning
-            if font is None:
-                logging.warning("No TTF font found, using default (text may appear small)")
-                font = ImageFont.load_default()
-            
-            # Draw month name
-            month_text = MONTH_NAMES[month - 1]
-            if MONTH_SEPARATOR['show_year']:
-                month_text += f" {TARGET_YEAR}"
-            
-            # Center text
-            bbox = draw.textbbox((0, 0), month_text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            x = (self.width - text_width) // 2
-            y = (self.height - text_height) // 2
-            
-            draw.text((x, y), month_text, fill=MONTH_SEPARATOR['text_color'], font=font)
-            
-            # Save image
-            temp_img_path = output_path.replace('.mp4', '.jpg')
-            img.save(temp_img_path, 'JPEG', quality=95)
-            
-            # Convert to video with fade in/out
-            fade_frames = int(FADE_DURATION * self.fps)
-            total_frames = int(MONTH_SEPARATOR_DURATION * self.fps)
+            img = self._separator_frame(month)
             
+            # Convert to video with fade in/out (raw frame piped on stdin)
             cmd = [
                 'ffmpeg',
-                '-loop', '1',
-                '-i', temp_img_path,
-                '-vf', f'fade=t=in:st=0:d={FADE_DURATION},fade=t=out:st={MONTH_SEPARATOR_DURATION - FADE_DURATION}:d={FADE_DURATION},fps={self.fps}',
+                *self._raw_input_args(),
+                '-vf', f'loop=loop=-1:size=1:start=0,{self._separator_fades()},fps={self.fps}',
                 '-t', str(MONTH_SEPARATOR_DURATION),
-                '-c:v', VIDEO_SETTINGS['video_codec'],
+                *self.encoder_args(),
                 '-pix_fmt', VIDEO_SETTINGS['pixel_format'],
+                '-r', str(self.fps),
                 '-y',
                 output_path
             ]
             
-            subprocess.run(cmd, check=True, capture_output=True)
-            
-            # Clean up temp image
-            if os.path.exists(temp_img_path):
-                os.remove(temp_img_path)
+            run_ffmpeg(cmd, input=img.tobytes())
             
             return output_path
             
@@ -473,12 +832,90 @@ class VideoGenerator:
             logging.error(f"Error creating month separator: {e}")
             raise
     
+    def create_month_separators(self, separators: List[Tuple[int, str]]):
+        """
+        Create several month separators with a single ffmpeg process
+        
+        One title card per month is piped on stdin; the filter graph picks each
+        frame out of the stream, holds it for the separator duration and fades
+        it into its own output file. Falls back to one process per month if
+        the batch fails.
+        
+        Args:
+            separators: List of (month, output_path) tuples
+        """
+        if len(separators) <= 1:
+            for month, output_path in separators:
+                self.create_month_separator(month, output_path)
+            return
+        
+        total_frames = int(MONTH_SEPARATOR_DURATION * self.fps)
+        graph = [f"[0:v]split={len(separators)}" + ''.join(f"[s{i}]" for i in range(len(separators)))]
+        outputs = []
+        for i, (_, output_path) in enumerate(separators):
+            graph.append(
+                f"[s{i}]select=eq(n\\,{i}),loop=loop={total_frames - 1}:size=1:start=0,"
+                f"setpts=N/({self.fps}*TB),{self._separator_fades()}[v{i}]"
+            )
+            outputs += [
+                '-map', f'[v{i}]',
+                '-frames:v', str(total_frames),
+                *self.encoder_args(),
+                '-pix_fmt', VIDEO_SETTINGS['pixel_format'],
+                '-r', str(self.fps),
+                output_path
+            ]
+        
+        frames = b''.join(self._separator_frame(month).tobytes() for month, _ in separators)
+        cmd = ['ffmpeg', '-y', *self._raw_input_args(), '-filter_complex', ';'.join(graph), *outputs]
+        
+        try:
+            run_ffmpeg(cmd, input=frames)
+        except Exception as e:
+            logging.warning(f"Month separator batch failed ({e}), creating them one by one")
+            for month, output_path in separators:
+                self.create_month_separator(month, output_path)
+    
+    def clip_output_path(self, media_info: Dict, index: int) -> str:
+        """Path of the processed clip for a media file at a sequence index"""
+        filename = os.path.basename(media_info['filepath'])
+        output_filename = f"{index:04d}_{os.path.splitext(filename)[0]}.mp4"
+        return os.path.join(PROCESSED_FOLDER, output_filename)
+    
+    def process_image_batch(self, tasks: List[Tuple[Dict, int]]) -> List[Optional[str]]:
+        """
+        Process several images with one Ken Burns ffmpeg run
+        
+        Falls back to processing each image on its own if the batch fails.
+        
+        Args:
+            tasks: List of (media_info, index) tuples for non-HEIC images
+            
+        Returns:
+            Processed clip paths (None for failures), in the same order as tasks
+        """
+        jobs = [
+            (media_info['filepath'], self.clip_output_path(media_info, index),
+             random.choice([True, False]), media_info.get('_caption'))
+            for media_info, index in tasks
+        ]
+        logging.info(f"Processing {len(jobs)} images in one batch "
+                     f"[{tasks[0][1]}-{tasks[-1][1]}]")
+        
+        try:
+            self.create_ken_burns_batch(jobs, PHOTO_DURATION)
+            return [output_path for _, output_path, _, _ in jobs]
+        except Exception as e:
+            logging.warning(f"Ken Burns batch failed ({e}), processing images one by one")
+            return [self.process_media_file(media_info, index) for media_info, index in tasks]
+    
     def process_media_file(self, media_info: Dict, index: int) -> str:
         """
         Process a single media file
         
         Args:
-            media_info: Media information dictionary
+            media_info: Media information dictionary (an optional '_caption'
+                        date is baked into the clip as it is encoded)
             index: Sequence index
             
         Returns:
@@ -487,48 +924,46 @@ class VideoGenerator:
         filepath = media_info['filepath']
         media_type = media_info['type']
         filename = os.path.basename(filepath)
-        
-        # Output path
-        output_filename = f"{index:04d}_{os.path.splitext(filename)[0]}.mp4"
-        output_path = os.path.join(PROCESSED_FOLDER, output_filename)
+        output_path = self.clip_output_path(media_info, index)
+        date_str = media_info.get('_caption')
         
         logging.info(f"Processing [{index}]: {filename} ({media_type})")
         
         try:
             if media_type == 'gif':
                 # Process GIF
-                self.process_gif(filepath, output_path)
+                self.process_gif(filepath, output_path, date_str)
                 
             elif media_type == 'video':
                 # Extract video clip
-                self.extract_video_clip(filepath, output_path, VIDEO_DURATION)
+                self.extract_video_clip(filepath, output_path, VIDEO_DURATION, date_str)
                 
             elif media_type == 'image':
-                # Convert HEIC first if needed
+                # Decode HEIC in memory first if needed
                 process_path = filepath
                 try:
                     if filepath.lower().endswith('.heic'):
-                        logging.debug(f"Converting HEIC to JPG: {filename}")
-                        process_path = self.convert_heic_to_jpg(filepath)
+                        logging.debug(f"Decoding HEIC: {filename}")
+                        process_path = self.convert_heic(filepath)
                 except Exception as e:
                     logging.error(f"Failed to convert HEIC {filename}: {e}")
                     # Try to use static video method as fallback
-                    return self.create_static_image_video(filepath, output_path, PHOTO_DURATION) if not filepath.lower().endswith('.heic') else None
+                    return self.create_static_image_video(filepath, output_path, PHOTO_DURATION, date_str) if not filepath.lower().endswith('.heic') else None
                 
                 # Apply Ken Burns effect to static images
                 try:
                     if KEN_BURNS['enabled']:
                         zoom_in = random.choice([True, False])
                         self.create_ken_burns_image(process_path, output_path, 
-                                                   PHOTO_DURATION, zoom_in)
+                                                   PHOTO_DURATION, zoom_in, date_str)
                     else:
                         self.create_static_image_video(process_path, output_path, 
-                                                       PHOTO_DURATION)
+                                                       PHOTO_DURATION, date_str)
                 except Exception as e:
                     logging.error(f"Failed to process image with effects: {e}")
                     # Final fallback - try static video without Ken Burns
                     logging.warning(f"Attempting static video as final fallback for {filename}")
-                    self.create_static_image_video(process_path, output_path, PHOTO_DURATION)
+                    self.create_static_image_video(process_path, output_path, PHOTO_DURATION, date_str)
             
             return output_path
             
@@ -536,258 +971,395 @@ class VideoGenerator:
             logging.error(f"Failed to process {filename}: {e}")
             return None
     
-    def normalize_clip(self, input_path: str) -> str:
+    def _date_caption_filter(self, date_str: str) -> Optional[str]:
         """
-        Normalize a clip to ensure consistent parameters for concatenation
-        Fixes frame rate, pixel format, and ensures exact resolution
+        Build the drawtext filter for a date caption
         
         Args:
-            input_path: Path to clip to normalize
+            date_str: Date string in YYYY-MM-DD format
             
         Returns:
-            Path to normalized clip (same as input after normalization)
+            drawtext filter string, or None if captions are disabled
         """
-        try:
-            normalized_path = input_path.replace('.mp4', '_norm.mp4')
-            
-            cmd = [
-                'ffmpeg',
-                '-i', input_path,
-                '-vf', f'fps={self.fps},scale={self.width}:{self.height}:force_original_aspect_ratio=decrease,pad={self.width}:{self.height}:(ow-iw)/2:(oh-ih)/2',
-                '-c:v', VIDEO_SETTINGS['video_codec'],
-                '-crf', str(VIDEO_SETTINGS['crf']),
-                '-pix_fmt', VIDEO_SETTINGS['pixel_format'],  # Force yuv420p
-                '-r', str(self.fps),  # Force 30 fps
-                '-c:a', 'aac',
-                '-b:a', '128k',
-                '-strict', 'experimental',
-                '-y',
-                normalized_path
-            ]
-            
-            subprocess.run(cmd, check=True, capture_output=True)
-            
-            # Replace original with normalized
-            if os.path.exists(normalized_path):
-                os.remove(input_path)
-                os.rename(normalized_path, input_path)
-            
-            return input_path
-            
-        except Exception as e:
-            logging.error(f"Failed to normalize clip {input_path}: {e}")
-            return input_path  # Return original if normalization fails
+        from config import DATE_CAPTION
+        
+        if not DATE_CAPTION['enabled']:
+            return None
+        
+        # Parse date and format nicely
+        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+        # Format: "1 Ene 2025"
+        months_short = ["Ene", "Feb", "Mar", "Abr", "May", "Jun",
+                       "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
+        date_text = f"{date_obj.day} {months_short[date_obj.month-1]} {date_obj.year}"
+        
+        # Determine position
+        position = DATE_CAPTION['position']
+        margin = DATE_CAPTION['margin']
+        
+        if position == 'top_left':
+            x, y = margin, margin
+        elif position == 'top_right':
+            x, y = f'w-text_w-{margin}', margin
+        elif position == 'bottom_left':
+            x, y = margin, f'h-text_h-{margin}'
+        else:  # bottom_right
+            x, y = f'w-text_w-{margin}', f'h-text_h-{margin}'
+        
+        # The text is read from a file (parsed once, no quoting issues) and the
+        # font is given by path when one is found, so ffmpeg skips the fontconfig lookup
+        textfile = os.path.join(TEMP_FOLDER, f"caption_{date_str}.txt")
+        if not os.path.exists(textfile):
+            tmp_path = f"{textfile}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(date_text)
+            os.replace(tmp_path, textfile)
+        
+        font_file = _caption_font_file()
+        font_option = f"fontfile={escape_filter_value(font_file)}:" if font_file else ""
+        
+        return (
+            f"drawtext=textfile={escape_filter_value(textfile)}:"
+            f"{font_option}"
+            f"fontsize={DATE_CAPTION['font_size']}:"
+            f"fontcolor={DATE_CAPTION['font_color']}:"
+            f"x={x}:y={y}:"
+            f"shadowcolor=black@0.8:shadowx=2:shadowy=2"
+        )
     
-    def add_date_caption(self, input_path: str, date_str: str) -> str:
+    def _caption_filters(self, date_str: Optional[str]) -> List[str]:
         """
-        Add date caption overlay to a video clip
+        drawtext filter to bake a date caption into a clip's first encode
         
         Args:
-            input_path: Path to video clip
-            date_str: Date string in YYYY-MM-DD format
+            date_str: Date string in YYYY-MM-DD format, or None for no caption
             
         Returns:
-            Path to video with caption
+            List with the drawtext filter, or empty if there is no caption
         """
-        from config import DATE_CAPTION
+        caption = self._date_caption_filter(date_str) if date_str else None
+        return [caption] if caption else []
+    
+    def compile_captioned_video(self, clips: List[Tuple[str, Optional[str], bool]], output_path: str,
+                                threads: Optional[int] = None):
+        """
+        Normalize, caption and concatenate clips with one ffmpeg filter graph
         
-        if not DATE_CAPTION['enabled']:
-            return input_path
+        Every clip is decoded once, scaled/padded to the output format if needed,
+        gets its date caption and is joined with the concat filter, so the only
+        encode is the final one (video only; the soundtrack is added afterwards).
+        One graph opens a decoder and a file per clip, so longer clip lists are
+        compiled in parts of COMPILE_MAX_INPUTS clips; the parts share encoder
+        parameters and are joined by stream copy.
+        
+        Args:
+            clips: List of (clip path, date string or None for no caption,
+                   whether the clip needs normalizing) in order. Image clips and
+                   separators are created at the output format and can skip it.
+            output_path: Output video path
+            threads: ffmpeg thread budget (see thread_args); defaults to all cores
+        """
+        if len(clips) <= COMPILE_MAX_INPUTS:
+            self._compile_clip_graph(clips, output_path, threads)
+            return
         
+        name = os.path.splitext(os.path.basename(output_path))[0]
+        parts = []
         try:
-            # Parse date and format nicely
-            from datetime import datetime
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-            # Format: "1 Ene 2025"
-            months_short = ["Ene", "Feb", "Mar", "Abr", "May", "Jun",
-                           "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
-            date_text = f"{date_obj.day} {months_short[date_obj.month-1]} {date_obj.year}"
-            
-            # Determine position
-            position = DATE_CAPTION['position']
-            margin = DATE_CAPTION['margin']
-            
-            if position == 'top_left':
-                x, y = margin, margin
-            elif position == 'top_right':
-                x, y = f'w-text_w-{margin}', margin
-            elif position == 'bottom_left':
-                x, y = margin, f'h-text_h-{margin}'
-            else:  # bottom_right
-                x, y = f'w-text_w-{margin}', f'h-text_h-{margin}'
-            
-            # Create caption with FFmpeg drawtext
-            caption_path = input_path.replace('.mp4', '_caption.mp4')
-            
-            drawtext_filter = (
-                f"drawtext=text='{date_text}':"
-                f"fontsize={DATE_CAPTION['font_size']}:"
-                f"fontcolor={DATE_CAPTION['font_color']}:"
-                f"x={x}:y={y}:"
-                f"shadowcolor=black@0.8:shadowx=2:shadowy=2"
-            )
-            
-            cmd = [
-                'ffmpeg',
-                '-i', input_path,
-                '-vf', drawtext_filter,
-                '-c:v', VIDEO_SETTINGS['video_codec'],
-                '-crf', str(VIDEO_SETTINGS['crf']),
-                '-c:a', 'copy',
-                '-y',
-                caption_path
-            ]
-            
-            subprocess.run(cmd, check=True, capture_output=True)
-            
-            # Replace original with captioned version
-            if os.path.exists(caption_path):
-                os.remove(input_path)
-                os.rename(caption_path, input_path)
-            
-            return input_path
-            
+            for start in range(0, len(clips), COMPILE_MAX_INPUTS):
+                part_path = os.path.join(TEMP_FOLDER, f"{name}_part{len(parts):02d}.mp4")
+                self._compile_clip_graph(clips[start:start + COMPILE_MAX_INPUTS], part_path, threads)
+                parts.append(part_path)
+            self.compile_final_video(parts, output_path)
+        finally:
+            for part_path in parts:
+                try:
+                    os.remove(part_path)
+                except FileNotFoundError:
+                    pass
+    
+    def _compile_clip_graph(self, clips: List[Tuple[str, Optional[str], bool]], output_path: str,
+                            threads: Optional[int] = None):
+        """compile_captioned_video body for one filter graph (one ffmpeg run)"""
+        logging.info(f"Compiling {len(clips)} clips into {os.path.basename(output_path)}...")
+        
+        normalize = (
+            f"fps={self.fps},"
+            f"scale={self.width}:{self.height}:force_original_aspect_ratio=decrease,"
+            f"pad={self.width}:{self.height}:(ow-iw)/2:(oh-ih)/2,"
+            f"setsar=1,format={VIDEO_SETTINGS['pixel_format']}"
+        )
+        
+        inputs = []
+        filter_parts = []
+        for i, (clip, date_str, needs_normalize) in enumerate(clips):
+            inputs.extend(['-i', clip])
+            chain = normalize if needs_normalize else "setsar=1"
+            caption = self._date_caption_filter(date_str) if date_str else None
+            if caption:
+                chain += f",{caption}"
+            filter_parts.append(f"[{i}:v:0]{chain}[v{i}]")
+        
+        labels = ''.join(f"[v{i}]" for i in range(len(clips)))
+        filter_parts.append(f"{labels}concat=n={len(clips)}:v=1:a=0[outv]")
+        
+        # The graph grows with the number of clips: pass it as a script file
+        # instead of on the command line
+        script_name = os.path.splitext(os.path.basename(output_path))[0]
+        filter_script = os.path.join(TEMP_FOLDER, f'filter_{script_name}.txt')
+        with open(filter_script, 'w', encoding='utf-8') as f:
+            f.write(';\n'.join(filter_parts))
+        
+        cmd = [
+            'ffmpeg',
+            *inputs,
+            '-filter_complex_script', filter_script,
+            '-map', '[outv]',
+            *self.encoder_args(),
+            *self.thread_args(threads),
+            '-pix_fmt', VIDEO_SETTINGS['pixel_format'],
+            '-r', str(self.fps),
+            '-an',
+            '-progress', 'pipe:1',  # Send progress to stdout
+            '-y'
+        ]
+        
+        total_duration = self._total_duration(self._probe_clips([clip for clip, _, _ in clips]))
+        self._run_to_output(cmd, output_path, total_duration)
+        logging.info(f"✅ Video created: {output_path}")
+    
+    def _probe_clips(self, clip_list: List[str]) -> List[Dict]:
+        """Probe every clip with ffprobe, concurrently (empty list if any probe fails)"""
+        try:
+            with ThreadPoolExecutor(max_workers=min(16, max(1, len(clip_list)))) as executor:
+                return list(executor.map(probe_media, clip_list))
         except Exception as e:
-            logging.warning(f"Failed to add date caption: {e}")
-            return input_path  # Return original if caption fails
+            logging.debug(f"Could not probe clips: {e}")
+            return []
+    
+    def _total_duration(self, probes: List[Dict]) -> float:
+        """Sum clip durations for progress estimation (0 if unknown)"""
+        try:
+            total_duration = sum(float(probe['format']['duration']) for probe in probes)
+        except (KeyError, ValueError):
+            total_duration = 0
+        
+        if total_duration:
+            logging.info(f"Total duration to process: {format_duration(total_duration)}")
+        else:
+            logging.warning("Could not calculate total duration for progress")
+        return total_duration
+    
+    def _can_stream_copy(self, probes: List[Dict]) -> bool:
+        """
+        Check whether clips can be joined by the concat demuxer without re-encoding
+        
+        Args:
+            probes: ffprobe results for every clip
+            
+        Returns:
+            True if all clips share codec, resolution, pixel format, frame rate
+            and time base
+        """
+        if not probes:
+            return False
+        
+        def signature(probe: Dict) -> Tuple:
+            streams = probe.get('streams', [])
+            video = next((st for st in streams if st.get('codec_type') == 'video'), {})
+            return (
+                video.get('codec_name'), video.get('profile'),
+                video.get('width'), video.get('height'), video.get('pix_fmt'),
+                video.get('r_frame_rate'), video.get('time_base')
+            )
+        
+        first = signature(probes[0])
+        return first[0] is not None and all(signature(probe) == first for probe in probes[1:])
     
     def compile_final_video(self, clip_list: List[str], output_path: str):
         """
         Compile all clips into final video with progress display
         
+        Clips that were all encoded with the same parameters (e.g. month videos)
+        are joined by stream copy; anything else is re-encoded.
+        
         Args:
             clip_list: List of video clip paths in order
             output_path: Final output video path
         """
         logging.info("Compiling final video...")
         
-        # Create concat file for FFmpeg
-        concat_file = os.path.join(TEMP_FOLDER, 'concat_list.txt')
+        # Create concat file for FFmpeg (named after the output so concurrent compiles don't collide)
+        concat_name = os.path.splitext(os.path.basename(output_path))[0]
+        concat_file = os.path.join(TEMP_FOLDER, f'concat_{concat_name}.txt')
         with open(concat_file, 'w', encoding='utf-8') as f:
             for clip in clip_list:
                 # FFmpeg concat format
                 f.write(f"file '{os.path.abspath(clip)}'\n")
         
         # Calculate total duration for progress estimation
-        total_duration = 0
-        try:
-            for clip in clip_list:
-                probe = ffmpeg.probe(clip)
-                total_duration += float(probe['format']['duration'])
-            logging.info(f"Total duration to process: {format_duration(total_duration)}")
-        except:
-            logging.warning("Could not calculate total duration for progress")
-            total_duration = 0
+        probes = self._probe_clips(clip_list)
+        total_duration = self._total_duration(probes)
+        
+        if self._can_stream_copy(probes):
+            # Identical parameters: the concat demuxer can copy packets as-is
+            logging.info("Clips share encoding parameters - joining without re-encoding")
+            codec_args = ['-c', 'copy', '-movflags', '+faststart']
+        else:
+            # Concatenate all clips with re-encoding for compatibility
+            # This prevents frozen frame issues from codec mismatches
+            codec_args = [
+                *self.encoder_args(),
+                *self.thread_args(),
+                '-pix_fmt', VIDEO_SETTINGS['pixel_format'],
+                '-an',  # Clips are video-only (see extract_video_clip)
+            ]
         
-        # Concatenate all clips with re-encoding for compatibility
-        # This prevents frozen frame issues from codec mismatches
         cmd = [
             'ffmpeg',
             '-f', 'concat',
             '-safe', '0',
             '-i', concat_file,
-            '-c:v', VIDEO_SETTINGS['video_codec'],
-            '-crf', str(VIDEO_SETTINGS['crf']),
-            '-preset', VIDEO_SETTINGS['preset'],
-            '-pix_fmt', VIDEO_SETTINGS['pixel_format'],
-            '-c:a', 'aac',
-            '-b:a', '128k',
+            *codec_args,
             '-progress', 'pipe:1',  # Send progress to stdout
-            '-y',
-            output_path
+            '-y'
         ]
         
+        self._run_to_output(cmd, output_path, total_duration)
+        logging.info(f"✅ Final video created: {output_path}")
+    
+    def _run_to_output(self, cmd: List[str], output_path: str, total_duration: float):
+        """
+        Run an ffmpeg command into a .part file next to output_path, then rename
+        it into place
+        
+        An ffmpeg run that fails or is interrupted never leaves a truncated
+        video at output_path, where it would pass for a finished one.
+        
+        Args:
+            cmd: ffmpeg command (with '-progress pipe:1'), without the output path
+            output_path: Final output video path
+            total_duration: Expected output duration in seconds (0 if unknown)
+        """
+        root, ext = os.path.splitext(output_path)
+        part_path = f"{root}.part{ext}"  # Keep the extension: ffmpeg picks the muxer from it
+        try:
+            self._run_with_progress([*cmd, part_path], total_duration)
+            os.replace(part_path, output_path)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+    
+    def _run_with_progress(self, cmd: List[str], total_duration: float):
+        """
+        Run an ffmpeg command that reports -progress on stdout, showing a progress bar
+        
+        Args:
+            cmd: ffmpeg command (must include '-progress pipe:1')
+            total_duration: Expected output duration in seconds (0 if unknown)
+        """
         try:
-            import sys
-            import re
-            import threading
-            
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True,
-                bufsize=1
-            )
-            
-            # Create a thread to consume stderr to prevent deadlock
-            # FFmpeg writes a lot to stderr, and if the buffer fills up, it will pause
-            stderr_lines = []
-            def read_stderr():
-                """Read stderr in background to prevent buffer overflow deadlock"""
-                for line in process.stderr:
-                    stderr_lines.append(line)
-            
-            stderr_thread = threading.Thread(target=read_stderr, daemon=True)
-            stderr_thread.start()
-            
-            last_time = 0
-            while True:
-                line = process.stdout.readline()
-                if not line:
-                    break
+            # stderr only carries errors (-loglevel error) and goes to a temp
+            # file, so it can't fill a pipe and stall ffmpeg; no reader thread needed
+            with tempfile.TemporaryFile() as stderr_file:
+                process = subprocess.Popen(
+                    [cmd[0], *FFMPEG_QUIET_ARGS, *cmd[1:]],
+                    stdout=subprocess.PIPE,
+                    stderr=stderr_file,
+                    universal_newlines=True,
+                    bufsize=1
+                )
+                
+                self._show_progress(process, total_duration)
+                
+                # Wait for completion
+                process.wait()
                 
-                # Parse progress from FFmpeg output
-                if line.startswith('out_time_ms='):
-                    value = line.split('=')[1].strip()
-                    # Skip if value is N/A (happens with some video formats)
-                    if value == 'N/A' or not value.isdigit():
-                        continue
-                    time_ms = int(value)
-                    time_s = time_ms / 1000000.0  # Convert microseconds to seconds
-                    
-                    # Update progress every 5 seconds
-                    if time_s - last_time >= 5 or (total_duration > 0 and time_s >= total_duration * 0.99):
-                        last_time = time_s
-                        if total_duration > 0:
-                            progress = min(100, (time_s / total_duration) * 100)
-                            bar_length = 40
-                            filled = int(bar_length * progress / 100)
-                            bar = '█' * filled + '░' * (bar_length - filled)
-                            print(f"\r⏳ Progreso: [{bar}] {progress:.1f}% ({format_duration(time_s)} / {format_duration(total_duration)})", end='', flush=True)
-                        else:
-                            print(f"\r⏳ Procesando: {format_duration(time_s)}", end='', flush=True)
-            
-            # Wait for completion
-            process.wait()
-            
-            # Wait for stderr thread to finish reading
-            stderr_thread.join(timeout=5)
-            
-            # Print newline after progress bar
-            if total_duration > 0:
-                print()  # New line after progress bar
-            
-            if process.returncode != 0:
-                stderr_output = ''.join(stderr_lines)
-                logging.error(f"Error concatenating videos: {stderr_output}")
-                raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr_output)
-            
-            logging.info(f"✅ Final video created: {output_path}")
+                # Print newline after progress bar
+                if total_duration > 0:
+                    print()  # New line after progress bar
+                
+                if process.returncode != 0:
+                    stderr_file.seek(0)
+                    stderr_output = stderr_file.read().decode(errors='replace')
+                    raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr_output)
             
         except subprocess.CalledProcessError as e:
             logging.error(f"Error concatenating videos: {e.stderr if hasattr(e, 'stderr') else str(e)}")
             raise
     
-    def generate(self):
-        """Main video generation workflow"""
+    def _show_progress(self, process: subprocess.Popen, total_duration: float):
+        """
+        Print a progress bar from ffmpeg's -progress output until it ends
+        
+        Args:
+            process: Running ffmpeg process with -progress on its stdout pipe
+            total_duration: Expected output duration in seconds (0 if unknown)
+        """
+        last_time = 0
+        while True:
+            line = process.stdout.readline()
+            if not line:
+                break
+            
+            # Parse progress from FFmpeg output
+            if line.startswith('out_time_ms='):
+                value = line.split('=')[1].strip()
+                # Skip if value is N/A (happens with some video formats)
+                if value == 'N/A' or not value.isdigit():
+                    continue
+                time_ms = int(value)
+                time_s = time_ms / 1000000.0  # Convert microseconds to seconds
+                
+                # Update progress every 5 seconds
+                if time_s - last_time >= 5 or (total_duration > 0 and time_s >= total_duration * 0.99):
+                    last_time = time_s
+                    if total_duration > 0:
+                        progress = min(100, (time_s / total_duration) * 100)
+                        bar_length = 40
+                        filled = int(bar_length * progress / 100)
+                        bar = '█' * filled + '░' * (bar_length - filled)
+                        print(f"\r⏳ Progreso: [{bar}] {progress:.1f}% ({format_duration(time_s)} / {format_duration(total_duration)})", end='', flush=True)
+                    else:
+                        print(f"\r⏳ Procesando: {format_duration(time_s)}", end='', flush=True)
+    
+    def generate(self, assignments: Optional[Dict[str, List[Dict]]] = None,
+                 out_path: Optional[str] = None):
+        """
+        Main video generation workflow
+        
+        Args:
+            assignments: Date -> media list to render; defaults to the assignment
+                         file (see load_assignments)
+            out_path: Output video path; defaults to FINAL_VIDEO
+        """
         logging.info("=" * 60)
         logging.info("VIDEO GENERATION SCRIPT - PHASE 3")
         logging.info("=" * 60)
         
         # Load assignments
         logging.info("Loading media assignments...")
-        assignments = self.load_assignments()
+        if assignments is None:
+            assignments = self.load_assignments()
+        output_path = out_path or FINAL_VIDEO
         
         # Sort dates
         sorted_dates = sorted(assignments.keys())
         logging.info(f"Processing {len(sorted_dates)} days with media")
         
         # Process all media in chronological order
-        all_clips = []
-        all_clip_dates = []  # Track dates for captions
+        # Media encodes are independent: collect them first and run them in a
+        # process pool, then assemble the clip list in order
+        ordered = []  # (separator path, None) or (task number, date_str)
+        tasks = []
         current_month = 0
-        clip_index = 0
+        
+        # Render the missing month separators with one ffmpeg process
+        months = sorted({int(date_str[5:7]) for date_str in sorted_dates})
+        separator_paths = {month: self.separator_path(month) for month in months}
+        self.create_month_separators(
+            [(month, path) for month, path in separator_paths.items() if not os.path.exists(path)]
+        )
         
         for date_str in sorted_dates:
             # Parse date
@@ -798,70 +1370,137 @@ class VideoGenerator:
                 current_month = date_obj.month
                 logging.info(f"\n--- {MONTH_NAMES[current_month - 1]} ---")
                 
-                separator_path = os.path.join(
-                    PROCESSED_FOLDER, 
-                    f"separator_{current_month:02d}.mp4"
-                )
-                self.create_month_separator(current_month, separator_path)
-                all_clips.append(separator_path)
-                all_clip_dates.append(None)  # No date for separators
-            
-            # Process all media for this day
-            media_list = assignments[date_str]
-            for media_info in media_list:
-                processed_clip = self.process_media_file(media_info, clip_index)
-                if processed_clip:
-                    all_clips.append(processed_clip)
-                    all_clip_dates.append(date_str)  # Track date for this clip
-                    clip_index += 1
-        
-        # Normalize only video/GIF clips (images are already pre-normalized)
-        logging.info(f"\nNormalizing video clips for compatibility...")
-        for i, clip in enumerate(all_clips):
-            clip_name = os.path.basename(clip)
-            
-            # Skip month separators and image-based clips (already normalized)
-            if 'separator_' in clip_name or all_clip_dates[i]:
-                # Check if it's a video/GIF that needs normalization
-                # Images (from Ken Burns or static) are already pre-normalized
-                original_file = None
-                if all_clip_dates[i]:
-                    # Find the original media file
-                    date_str = all_clip_dates[i]
-                    for media_info in assignments[date_str]:
-                        if clip_name.startswith(f"{clip_name.split('_')[0]}_"):
-                            original_file = media_info['filepath']
-                            break
-                
-                # Only normalize if original was a video or GIF
-                if original_file and (original_file.lower().endswith(('.mp4', '.mov', '.avi', '.mkv', '.gif'))):
-                    logging.info(f"Normalizing {i+1}/{len(all_clips)}: {clip_name}")
-                    self.normalize_clip(clip)
+                ordered.append((separator_paths[current_month], None))  # No date for separators
             
-            # Add date caption if enabled (after normalization)
-            if all_clip_dates[i]:  # Skip separators
-                self.add_date_caption(clip, all_clip_dates[i])
+            # Queue all media for this day
+            # The date caption is baked into each clip's first encode
+            for media_info in assignments[date_str]:
+                ordered.append((len(tasks), date_str))
+                tasks.append((dict(media_info, _caption=date_str), len(tasks)))
+        
+        logging.info(f"\nProcessing {len(tasks)} media files with {ENCODE_WORKERS} workers...")
+        results = process_media_files(tasks)
+        
+        # Assemble the clip list, adding up the final duration on the way
+        # (the clip type is known from its task, no need to inspect paths)
+        clip_durations = {'image': PHOTO_DURATION, 'video': VIDEO_DURATION, 'gif': GIF_MAX_DURATION}
+        all_clips = []
+        total_duration = 0.0
+        for item, date_str in ordered:
+            if date_str is None:
+                processed_clip, clip_duration = item, MONTH_SEPARATOR_DURATION
+            else:
+                processed_clip = results[item]
+                clip_duration = clip_durations.get(tasks[item][0]['type'], VIDEO_DURATION)
+            if processed_clip:
+                all_clips.append(processed_clip)
+                total_duration += clip_duration
         
         # Compile final video
         logging.info(f"\nTotal clips to compile: {len(all_clips)}")
-        self.compile_final_video(all_clips, FINAL_VIDEO)
-        
-        # Calculate final duration
-        total_duration = sum([
-            PHOTO_DURATION if 'image' in clip else 
-            VIDEO_DURATION if 'video' in clip or clip.endswith('.mp4') else 
-            GIF_MAX_DURATION
-            for clip in all_clips
-        ])
+        self.compile_final_video(all_clips, output_path)
         
         logging.info("\n" + "=" * 60)
         logging.info("VIDEO GENERATION COMPLETE")
         logging.info("=" * 60)
-        logging.info(f"Final video: {FINAL_VIDEO}")
+        logging.info(f"Final video: {output_path}")
         logging.info(f"Total duration: ~{format_duration(total_duration)}")
         logging.info(f"Number of clips: {len(all_clips)}")
 
 
+# Per-process generator used by process_media_files workers
+_worker_generator = None
+
+
+def _init_worker(log_level: str):
+    """Set up a clip-processing worker process"""
+    global _worker_generator
+    random.seed()  # Forked workers would otherwise share the parent's RNG state
+    setup_logging(log_level)
+    _worker_generator = VideoGenerator()
+
+
+def _run_unit(generator: VideoGenerator, unit: List[Tuple[Dict, int]]) -> List[Optional[str]]:
+    """Process one work unit: an image batch or a single (media_info, index) task"""
+    if len(unit) > 1:
+        return generator.process_image_batch(unit)
+    media_info, index = unit[0]
+    return [generator.process_media_file(media_info, index)]
+
+
+def _process_unit(unit: List[Tuple[Dict, int]]) -> List[Optional[str]]:
+    """Process one work unit in a worker process"""
+    return _run_unit(_worker_generator, unit)
+
+
+def _is_batchable(media_info: Dict) -> bool:
+    """Whether a media file can go through the batched Ken Burns path"""
+    return (KEN_BURNS['enabled'] and media_info['type'] == 'image'
+            and not media_info['filepath'].lower().endswith('.heic'))
+
+
+def _plan_units(tasks: List[Tuple[Dict, int]], workers: int) -> List[List[int]]:
+    """
+    Group tasks into work units
+    
+    Ken Burns images are chunked into batches (small enough to keep every
+    worker busy); everything else is a unit of its own. Every output of a batch
+    opens its own encoder session and hardware encoders only allow a few at
+    once, so images are only batched with the software encoder.
+    
+    Args:
+        tasks: List of (media_info, index) tuples
+        workers: Number of worker processes sharing the work
+        
+    Returns:
+        List of units, each a list of positions in tasks
+    """
+    images = [i for i, (media_info, _) in enumerate(tasks) if _is_batchable(media_info)]
+    others = [[i] for i, (media_info, _) in enumerate(tasks) if not _is_batchable(media_info)]
+    
+    batch_limit = 1 if resolve_hw_encoder() else KEN_BURNS_BATCH_SIZE
+    batch_size = max(1, min(batch_limit, -(-len(images) // max(1, workers))))
+    return [images[i:i + batch_size] for i in range(0, len(images), batch_size)] + others
+
+
+def create_process_pool(workers: int = ENCODE_WORKERS) -> ProcessPoolExecutor:
+    """Create a process pool whose workers can run process_media_files tasks"""
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(LOG_LEVEL,))
+
+
+def process_media_files(tasks: List[Tuple[Dict, int]], workers: int = ENCODE_WORKERS,
+                        executor: Optional[ProcessPoolExecutor] = None) -> List[Optional[str]]:
+    """
+    Process media files in parallel (each work unit is an independent ffmpeg job)
+    
+    Args:
+        tasks: List of (media_info, index) tuples
+        workers: Number of worker processes (0 or 1 = serial)
+        executor: Shared pool from create_process_pool (overrides workers)
+        
+    Returns:
+        Processed clip paths (None for failures), in the same order as tasks
+    """
+    units = _plan_units(tasks, workers)
+    unit_tasks = [[tasks[i] for i in unit] for unit in units]
+    
+    if executor is not None:
+        unit_results = executor.map(_process_unit, unit_tasks)
+    elif workers <= 1 or len(units) <= 1:
+        generator = VideoGenerator()
+        unit_results = [_run_unit(generator, unit) for unit in unit_tasks]
+    else:
+        with create_process_pool(min(workers, len(units))) as pool:
+            unit_results = list(pool.map(_process_unit, unit_tasks))
+    
+    results = [None] * len(tasks)
+    for unit, paths in zip(units, unit_results):
+        for i, path in zip(unit, paths):
+            results[i] = path
+    return results
+
+
 def main():
     """Main execution"""
     setup_logging(LOG_LEVEL)
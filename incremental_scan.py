@@ -2,37 +2,130 @@
 Incremental media detection - only process new/changed files
 """
 import os
-import json
+import mmap
+import hashlib
+import tempfile
+from contextlib import contextmanager
 from typing import Dict, List, Set, Tuple
 from datetime import datetime
 
+from utils import json_dumps, json_loads
+
+# Optional: BLAKE3 for content hashing (falls back to hashlib's BLAKE2b)
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
+# POSIX advisory file locks (Windows runs without the lock; saves stay atomic)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+
+@contextmanager
+def scan_cache_lock(scan_file: str):
+    """
+    Hold an exclusive lock on the scan cache's .lock sidecar
+    
+    Serializes concurrent scans (e.g. a scheduled run and a manual one), so
+    one never saves over a cache the other is still comparing against.
+    
+    Args:
+        scan_file: Scan cache path
+    """
+    if not FCNTL_AVAILABLE:
+        yield
+        return
+    
+    with open(scan_file + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
 def load_previous_scan(scan_file: str) -> Dict:
-    """Load previous media scan results"""
+    """
+    Load previous media scan results
+    
+    Returns:
+        Dict with 'folder_mtime' (media folder mtime at the last scan, or None)
+        and 'files' ({filepath: signature})
+    """
     if not os.path.exists(scan_file):
-        return {}
+        return {'folder_mtime': None, 'files': {}}
     
-    with open(scan_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    with open(scan_file, 'rb') as f:
+        scan = json_loads(f.read())
+    
+    # Older caches were a flat {filepath: "mtime_size"} mapping
+    if 'files' not in scan:
+        scan = {'folder_mtime': None, 'files': scan}
+    for path, entry in scan['files'].items():
+        if isinstance(entry, str):
+            mtime, _, size = entry.rpartition('_')
+            scan['files'][path] = {'mtime': float(mtime), 'size': int(size), 'hash': None}
+    return scan
 
 
 def save_scan_results(scan_file: str, results: Dict):
-    """Save current scan results for next comparison"""
-    with open(scan_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2)
+    """Save current scan results for next comparison (atomically)"""
+    scan_dir = os.path.dirname(os.path.abspath(scan_file))
+    with tempfile.NamedTemporaryFile('wb', dir=scan_dir, suffix='.tmp', delete=False) as f:
+        tmp_path = f.name
+        try:
+            f.write(json_dumps(results))
+        except Exception:
+            f.close()
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, scan_file)
 
 
-def get_file_signature(filepath: str) -> str:
+def get_file_signature(filepath: str, stat: os.stat_result = None) -> Dict:
     """Get file signature (mtime + size) for change detection"""
-    stat = os.stat(filepath)
-    return f"{stat.st_mtime}_{stat.st_size}"
+    if stat is None:
+        stat = os.stat(filepath)
+    return {'mtime': stat.st_mtime, 'size': stat.st_size, 'hash': None}
+
+
+def get_content_hash(filepath: str) -> str:
+    """
+    Hash a file's content (BLAKE3 if available, else BLAKE2b)
+    
+    The file is memory-mapped and handed to the hasher as one buffer, so there
+    is no read loop or intermediate copies.
+    
+    Args:
+        filepath: File to hash
+        
+    Returns:
+        Hex digest
+    """
+    hasher = blake3.blake3 if BLAKE3_AVAILABLE else hashlib.blake2b
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hasher().hexdigest()  # Empty files can't be mapped
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hasher(mm).hexdigest()
 
 
-def detect_changes(current_files: Dict[str, str], previous_scan: Dict) -> Tuple[Set[str], Set[str], Set[str]]:
+def detect_changes(current_files: Dict[str, Dict], previous_scan: Dict) -> Tuple[Set[str], Set[str], Set[str]]:
     """
     Detect which files are new, changed, or deleted
     
+    Only stat data is compared, except to break a tie: a size change always
+    means changed, and if only the mtime moved (e.g. the file was touched or
+    copied) the content hash decides. A file is first hashed at such a tie, so
+    new files are never read just to build the change set.
+    
     Args:
-        current_files: Dict of {filepath: signature}
+        current_files: Dict of {filepath: signature}; updated in place with hashes
         previous_scan: Previous scan results
         
     Returns:
@@ -47,59 +140,96 @@ def detect_changes(current_files: Dict[str, str], previous_scan: Dict) -> Tuple[
     # Deleted files
     deleted_files = previous_paths - current_paths
     
-    # Changed files (same path, different signature)
+    # Changed files (same path, different size, or different mtime and content)
     changed_files = set()
     for path in current_paths & previous_paths:
-        if current_files[path] != previous_scan.get(path):
+        current, previous = current_files[path], previous_scan[path]
+        
+        if current['size'] == previous['size'] and current['mtime'] == previous['mtime']:
+            current['hash'] = previous.get('hash')
+            continue
+        
+        if current['size'] != previous['size']:
+            changed_files.add(path)
+            continue
+        
+        # Only the mtime moved. Without a previous hash there is nothing to
+        # compare against, so the file counts as changed; hash it now so the
+        # next touch can be told apart from an edit
+        current['hash'] = get_content_hash(path)
+        if current['hash'] != previous.get('hash'):
             changed_files.add(path)
     
     return new_files, changed_files, deleted_files
 
 
-def incremental_media_scan(media_folder: str, scan_cache_file: str = "media_scan_cache.json") -> Tuple[List[str], Set[str]]:
+def incremental_media_scan(media_folder: str, scan_cache_file: str = "media_scan_cache.json",
+                           force: bool = False) -> Tuple[List[str], Set[str]]:
     """
     Perform incremental scan of media folder
     
     Args:
         media_folder: Path to media folder
         scan_cache_file: Where to store scan cache
+        force: Ignore the previous scan and report every file as new
         
     Returns:
         Tuple of (all_files, files_to_process)
     """
+    with scan_cache_lock(scan_cache_file):
+        return _incremental_media_scan(media_folder, scan_cache_file, force)
+
+
+def _incremental_media_scan(media_folder: str, scan_cache_file: str, force: bool) -> Tuple[List[str], Set[str]]:
+    """incremental_media_scan body, run while holding the scan cache lock"""
     from config import ALL_SUPPORTED_FORMATS
     
+    # Load previous scan
+    if force:
+        previous_scan = {'folder_mtime': None, 'files': {}}
+    else:
+        previous_scan = load_previous_scan(scan_cache_file)
+    folder_mtime = os.stat(media_folder).st_mtime
+    
     # Scan current files
     current_files = {}
-    for filename in os.listdir(media_folder):
-        filepath = os.path.join(media_folder, filename)
-        
-        if not os.path.isfile(filepath):
-            continue
-        
-        ext = os.path.splitext(filename)[1].lower()
-        if ext in ALL_SUPPORTED_FORMATS:
+    if folder_mtime == previous_scan['folder_mtime']:
+        # No file was added, removed or renamed since the last scan: reuse the
+        # listing and only re-stat the files to catch in-place edits
+        for filepath in previous_scan['files']:
             current_files[filepath] = get_file_signature(filepath)
-    
-    # Load previous scan
-    previous_scan = load_previous_scan(scan_cache_file)
+    else:
+        # One scandir pass: the file type comes from the directory entry and
+        # the stat result is reused for the signature
+        with os.scandir(media_folder) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                
+                ext = os.path.splitext(entry.name)[1].lower()
+                if ext in ALL_SUPPORTED_FORMATS:
+                    current_files[entry.path] = get_file_signature(entry.path, entry.stat())
     
     # Detect changes
-    new_files, changed_files, deleted_files = detect_changes(current_files, previous_scan)
+    new_files, changed_files, deleted_files = detect_changes(current_files, previous_scan['files'])
     
     # Files that need processing
     files_to_process = new_files | changed_files
     
-    # Save current scan
-    save_scan_results(scan_cache_file, current_files)
+    # Save current scan (with the new mtimes, so touched files aren't re-hashed next time)
+    save_scan_results(scan_cache_file, {'folder_mtime': folder_mtime, 'files': current_files})
     
     return list(current_files.keys()), files_to_process
 
 
 if __name__ == "__main__":
     # Test incremental scan
+    import argparse
     from config import INPUT_FOLDER
-    all_files, to_process = incremental_media_scan(INPUT_FOLDER)
+    parser = argparse.ArgumentParser(description="Incremental media scan")
+    parser.add_argument('--force', action='store_true', help="Ignore the scan cache and rescan everything")
+    args = parser.parse_args()
+    all_files, to_process = incremental_media_scan(INPUT_FOLDER, force=args.force)
     print(f"Total files: {len(all_files)}")
     print(f"Files to process: {len(to_process)}")
     if to_process:
@@ -1,8 +1,11 @@
 import os
-import json
-import io
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, render_template, jsonify, request, send_file
-from config import MEDIA_ASSIGNMENT_JSON, INPUT_FOLDER
+from config import MEDIA_ASSIGNMENT_JSON, INPUT_FOLDER, PREVIEW_CACHE_FOLDER, VALIDATOR_USE_X_SENDFILE
+from utils import json_dumps, json_loads
 from PIL import Image
 try:
     from pillow_heif import register_heif_opener
@@ -12,6 +15,9 @@ except ImportError:
     HEIF_SUPPORT = False
 
 app = Flask(__name__)
+# Behind a web server with X-Sendfile support, media responses carry only a header
+# and the server copies the file itself (sendfile(2)) instead of Python
+app.config['USE_X_SENDFILE'] = VALIDATOR_USE_X_SENDFILE
 
 # Ensure we can serve files from the input folder
 # We'll use a custom route for this to handle absolute paths safely-ish for this local tool
@@ -25,12 +31,23 @@ def get_data():
     if not os.path.exists(MEDIA_ASSIGNMENT_JSON):
         return jsonify({})
     
-    with open(MEDIA_ASSIGNMENT_JSON, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # The file only changes through /api/save (or a new assignment run), so its
+    # mtime and size identify the response: unchanged data costs a 304, no read
+    stat = os.stat(MEDIA_ASSIGNMENT_JSON)
+    etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        with open(MEDIA_ASSIGNMENT_JSON, 'rb') as f:
+            data = json_loads(f.read())
+        
+        # Sort by date (serialized directly rather than through jsonify)
+        sorted_data = dict(sorted(data.items()))
+        response = app.response_class(json_dumps(sorted_data), mimetype='application/json')
     
-    # Sort by date
-    sorted_data = dict(sorted(data.items()))
-    return jsonify(sorted_data)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'  # Always revalidate, so saves show up
+    return response
 
 @app.route('/api/save', methods=['POST'])
 def save_data():
@@ -39,17 +56,92 @@ def save_data():
         # Validate structure roughly? Or just save.
         # The user wants to modify assignments.
         # We should probably backup the old one first?
+        # Write the new version next to the old one first, so a failed save
+        # never leaves a truncated assignment file
+        tmp_path = MEDIA_ASSIGNMENT_JSON + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(json_dumps(new_data, indent=True))
+        
+        # Back up the old version as a hard link (no copy); the rename below
+        # then gives the new version its own inode
         if os.path.exists(MEDIA_ASSIGNMENT_JSON):
-            import shutil
-            shutil.copy2(MEDIA_ASSIGNMENT_JSON, MEDIA_ASSIGNMENT_JSON + ".bak")
-            
-        with open(MEDIA_ASSIGNMENT_JSON, 'w', encoding='utf-8') as f:
-            json.dump(new_data, f, indent=2, ensure_ascii=False)
+            backup_path = MEDIA_ASSIGNMENT_JSON + ".bak"
+            if os.path.exists(backup_path):
+                os.remove(backup_path)
+            try:
+                os.link(MEDIA_ASSIGNMENT_JSON, backup_path)
+            except OSError:
+                # Filesystem without hard links (e.g. FAT/exFAT)
+                import shutil
+                shutil.copy2(MEDIA_ASSIGNMENT_JSON, backup_path)
+        
+        os.replace(tmp_path, MEDIA_ASSIGNMENT_JSON)
             
         return jsonify({"status": "success", "message": "Data saved successfully"})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+def heic_preview_path(file_path):
+    """Cached JPEG preview for a HEIC file, keyed on path, mtime and size"""
+    stat = os.stat(file_path)
+    key = hashlib.sha1(f"{file_path}|{stat.st_mtime_ns}|{stat.st_size}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(PREVIEW_CACHE_FOLDER, f"{key}.jpg")
+
+def create_heic_preview(file_path):
+    """Decode a HEIC file into its cached JPEG preview (if not cached yet) and return the preview path"""
+    preview_path = heic_preview_path(file_path)
+    if os.path.exists(preview_path):
+        return preview_path
+    
+    # Open HEIC and convert to JPEG
+    img = Image.open(file_path)
+    
+    # Palette images can only be resized with NEAREST, so convert those first
+    if img.mode == 'P':
+        img = img.convert('RGB')
+    
+    # Create a thumbnail (max 800px on longest side for performance). thumbnail()
+    # box-reduces by an integer factor first, so LANCZOS only resamples the
+    # last step (pillow-simd makes that step faster still, see requirements.txt)
+    img.thumbnail((800, 800), Image.Resampling.LANCZOS)
+    
+    # Convert to RGB if necessary (HEIC might have alpha channel); done after the
+    # resize so only the thumbnail's pixels are converted
+    if img.mode in ('RGBA', 'LA'):
+        img = img.convert('RGB')
+    
+    # Write to a temp file and rename, so a concurrent request never sees a partial JPEG
+    os.makedirs(PREVIEW_CACHE_FOLDER, exist_ok=True)
+    with tempfile.NamedTemporaryFile('wb', dir=PREVIEW_CACHE_FOLDER, suffix='.tmp', delete=False) as f:
+        tmp_path = f.name
+        try:
+            img.save(f, 'JPEG', quality=85)
+        except Exception:
+            f.close()
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, preview_path)
+    return preview_path
+
+def prewarm_heic_previews():
+    """Build the previews of every assigned HEIC file in the background"""
+    if not HEIF_SUPPORT or not os.path.exists(MEDIA_ASSIGNMENT_JSON):
+        return
+    
+    with open(MEDIA_ASSIGNMENT_JSON, 'rb') as f:
+        data = json_loads(f.read())
+    heic_files = [item['filepath'] for items in data.values() for item in items
+                  if item['filepath'].lower().endswith('.heic')]
+    
+    def warm(file_path):
+        try:
+            create_heic_preview(file_path)
+        except Exception:
+            pass  # The /media request will report it
+    
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+        list(executor.map(warm, heic_files))
+
 @app.route('/media')
 def serve_media():
     # Security note: This is a local tool, so we allow serving files from the system
@@ -65,35 +157,28 @@ def serve_media():
     if not os.path.exists(file_path):
         return "File not found", 404
     
-    # Check if it's a HEIC file and convert to JPEG for browser compatibility
+    # Check if it's a HEIC file and serve its JPEG preview for browser compatibility
     if file_path.lower().endswith('.heic'):
         if not HEIF_SUPPORT:
             return "HEIC support not available. Install pillow-heif.", 500
             
         try:
-            # Open HEIC and convert to JPEG
-            img = Image.open(file_path)
-            
-            # Convert to RGB if necessary (HEIC might have alpha channel)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
-            
-            # Create a thumbnail (max 800px on longest side for performance)
-            img.thumbnail((800, 800), Image.Resampling.LANCZOS)
-            
-            # Save to bytes buffer as JPEG
-            img_io = io.BytesIO()
-            img.save(img_io, 'JPEG', quality=85)
-            img_io.seek(0)
-            
-            return send_file(img_io, mimetype='image/jpeg')
+            preview_path = create_heic_preview(file_path)
         except Exception as e:
             return f"Error converting HEIC: {str(e)}", 500
         
-    # For all other file types, serve directly
-    return send_file(file_path)
+        response = send_file(preview_path, mimetype='image/jpeg', conditional=True)
+        response.headers['Cache-Control'] = 'public, max-age=3600'
+        return response
+        
+    # For all other file types, serve directly (conditional=True answers the
+    # browser's Range requests, so videos can seek without a full download)
+    return send_file(file_path, conditional=True)
 
 if __name__ == '__main__':
     print("Starting Media Validator UI...")
     print("Open http://localhost:5000 in your browser")
+    # Only in the reloader's serving process, not in the watcher that spawns it
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        threading.Thread(target=prewarm_heic_previews, daemon=True).start()
     app.run(debug=True, port=5000)
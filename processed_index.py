@@ -0,0 +1,106 @@
+"""
+Processed Clip Index
+Persists the source filename -> processed clip mapping so resumed runs don't
+have to rescan the processed folder
+"""
+import atexit
+import os
+import logging
+import tempfile
+import threading
+from typing import Callable, Dict, Optional
+
+from utils import bulk_exists, json_dumps, json_loads
+
+
+class ProcessedIndex:
+    """JSON-backed map of source filename (without extension) to processed clip path"""
+    
+    def __init__(self, index_file: str, rebuild: Callable[[], Dict[str, str]]):
+        """
+        Initialize processed clip index
+        
+        Args:
+            index_file: Path to index JSON file
+            rebuild: Function that scans the processed folder and returns a fresh
+                     mapping; used when the index is missing or stale
+        """
+        self.index_file = index_file
+        self._rebuild = rebuild
+        self._lock = threading.Lock()
+        # Serializes saves, so an older snapshot never replaces a newer file
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self.clips = self.load()
+        atexit.register(self.save)
+    
+    def load(self) -> Dict[str, str]:
+        """Load the index (dropping stale entries), rebuilding it from disk if missing"""
+        clips = None
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'rb') as f:
+                    clips = json_loads(f.read())
+            except Exception as e:
+                logging.warning("Error loading processed index: %s. Rebuilding.", e)
+        
+        # Validate every entry with one batch of concurrent stat calls and
+        # drop the clips that were deleted since the index was written
+        if clips is not None:
+            bases = list(clips)
+            exists = bulk_exists([clips[base] for base in bases])
+            stale = [base for base, ok in zip(bases, exists) if not ok]
+            for base in stale:
+                del clips[base]
+            if stale:
+                logging.info("Dropped %d stale entries from processed index", len(stale))
+                self._dirty = True
+            logging.info("📋 Loaded processed index (%d clips)", len(clips))
+            return clips
+        
+        clips = self._rebuild()
+        self._dirty = True
+        return clips
+    
+    def save(self):
+        """Save the index to disk (atomically) if it changed"""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                data = json_dumps(self.clips)
+                self._dirty = False
+            
+            tmp_path = None
+            try:
+                index_dir = os.path.dirname(os.path.abspath(self.index_file))
+                os.makedirs(index_dir, exist_ok=True)
+                with tempfile.NamedTemporaryFile('wb', dir=index_dir, suffix='.tmp',
+                                                 delete=False) as f:
+                    tmp_path = f.name
+                    f.write(data)
+                os.replace(tmp_path, self.index_file)
+                logging.debug("💾 Processed index saved")
+            except Exception as e:
+                logging.error("Error saving processed index: %s", e)
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+    
+    def add(self, base: str, path: str):
+        """
+        Record a newly processed clip
+        
+        Args:
+            base: Source filename without extension
+            path: Processed clip path
+        """
+        with self._lock:
+            self.clips[base] = path
+            self._dirty = True
+    
+    def get(self, base: str) -> Optional[str]:
+        """Get the processed clip path for a source filename base, if any"""
+        return self.clips.get(base)
+    
+    def __contains__(self, base: str) -> bool:
+        return base in self.clips
@@ -2,9 +2,15 @@
 Utility functions for media processing and metadata extraction
 """
 import os
+import re
+import mmap
+import struct
 import logging
-from datetime import datetime
-from typing import Optional, Tuple
+import tempfile
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+from typing import Dict, Optional, Tuple
 import exifread
 from PIL import Image
 import subprocess
@@ -19,6 +25,38 @@ except ImportError:
     HEIF_SUPPORTED = False
     logging.warning("pillow-heif not installed. HEIC files will use fallback method.")
 
+# Try to import orjson for faster JSON (de)serialization
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def json_dumps(obj, indent: bool = False) -> bytes:
+    """
+    Serialize an object to UTF-8 JSON bytes
+    
+    Args:
+        obj: Object to serialize
+        indent: Pretty-print with 2-space indentation (for human-readable files)
+        
+    Returns:
+        Encoded JSON bytes
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def json_loads(data):
+    """Deserialize JSON from bytes or str"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
 def setup_logging(log_level: str = "INFO"):
     """Configure logging for the application"""
@@ -29,6 +67,106 @@ def setup_logging(log_level: str = "INFO"):
     )
 
 
+# Persistent metadata date cache: "path|mtime_ns|size" -> ISO date ('' = no date)
+_METADATA_DATE_CACHE: Dict[str, str] = {}
+_METADATA_DATE_CACHE_NEW: Dict[str, str] = {}
+
+
+def load_metadata_date_cache(cache_file: str):
+    """Load metadata dates cached by previous runs (also used as a worker initializer)"""
+    if not os.path.exists(cache_file):
+        return
+    
+    try:
+        with open(cache_file, 'rb') as f:
+            _METADATA_DATE_CACHE.update(json_loads(f.read()))
+    except (OSError, ValueError) as e:
+        logging.warning("Error loading metadata date cache: %s", e)
+
+
+def save_metadata_date_cache(cache_file: str):
+    """
+    Save the metadata date cache if any date was read since it was loaded
+    
+    Written to a temp file and renamed into place, so worker initializers and
+    other runs loading the cache never see a partly written file.
+    """
+    if not _METADATA_DATE_CACHE_NEW:
+        return
+    
+    tmp_path = None
+    try:
+        cache_dir = os.path.dirname(os.path.abspath(cache_file))
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile('wb', dir=cache_dir, suffix='.tmp',
+                                         delete=False) as f:
+            tmp_path = f.name
+            f.write(json_dumps(_METADATA_DATE_CACHE))
+        os.replace(tmp_path, cache_file)
+        _METADATA_DATE_CACHE_NEW.clear()
+    except Exception as e:
+        logging.error("Error saving metadata date cache: %s", e)
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def pop_new_metadata_dates() -> Dict[str, str]:
+    """Return (and forget) the cache entries added by this process, so worker
+    processes can hand them back to the parent"""
+    entries = dict(_METADATA_DATE_CACHE_NEW)
+    _METADATA_DATE_CACHE_NEW.clear()
+    return entries
+
+
+def update_metadata_date_cache(entries: Dict[str, str]):
+    """Merge cache entries read by a worker process"""
+    _METADATA_DATE_CACHE.update(entries)
+    _METADATA_DATE_CACHE_NEW.update(entries)
+
+
+def cached_metadata_date(func):
+    """Memoize a filepath -> Optional[datetime] metadata reader on (path, mtime, size)"""
+    @wraps(func)
+    def wrapper(filepath: str) -> Optional[datetime]:
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return func(filepath)
+        
+        key = f"{filepath}|{stat.st_mtime_ns}|{stat.st_size}"
+        cached = _METADATA_DATE_CACHE.get(key)
+        if cached is not None:
+            return datetime.fromisoformat(cached) if cached else None
+        
+        result = func(filepath)
+        value = result.isoformat() if result else ''
+        _METADATA_DATE_CACHE[key] = _METADATA_DATE_CACHE_NEW[key] = value
+        return result
+    return wrapper
+
+
+# EXIF date tags in order of preference as (IFD, tag): DateTimeOriginal and
+# DateTimeDigitized live in the Exif sub-IFD, DateTime in IFD0
+EXIF_IFD = 0x8769
+EXIF_DATE_TAGS = [(EXIF_IFD, 36867), (EXIF_IFD, 36868), (None, 306)]
+
+
+def _exif_dates_pillow(filepath: str) -> list:
+    """Read the EXIF date strings with Pillow (only the metadata is parsed, no pixels are decoded)"""
+    with Image.open(filepath) as img:
+        exif = img.getexif()
+        ifds = {None: exif, EXIF_IFD: exif.get_ifd(EXIF_IFD)}
+        return [ifds[ifd].get(tag) for ifd, tag in EXIF_DATE_TAGS]
+
+
+def _exif_dates_exifread(filepath: str) -> list:
+    """Read the EXIF date strings with exifread (pure Python, used when Pillow can't open the file)"""
+    with open(filepath, 'rb') as f:
+        tags = exifread.process_file(f, stop_tag='DateTimeOriginal', details=False)
+    return [tags.get(tag) for tag in ('EXIF DateTimeOriginal', 'EXIF DateTimeDigitized', 'Image DateTime')]
+
+
+@cached_metadata_date
 def get_image_exif_date(filepath: str) -> Optional[datetime]:
     """
     Extract date taken from image EXIF data
@@ -40,33 +178,110 @@ def get_image_exif_date(filepath: str) -> Optional[datetime]:
         datetime object or None if not found
     """
     try:
-        with open(filepath, 'rb') as f:
-            tags = exifread.process_file(f, stop_tag='DateTimeOriginal')
-            
-            # Try different EXIF date tags
-            date_tags = [
-                'EXIF DateTimeOriginal',
-                'EXIF DateTimeDigitized',
-                'Image DateTime'
-            ]
-            
-            for tag in date_tags:
-                if tag in tags:
-                    date_str = str(tags[tag])
-                    try:
-                        # EXIF format: "YYYY:MM:DD HH:MM:SS"
-                        return datetime.strptime(date_str, "%Y:%m:%d %H:%M:%S")
-                    except ValueError:
-                        continue
+        date_values = _exif_dates_pillow(filepath)
     except Exception as e:
-        logging.debug(f"Error reading EXIF from {os.path.basename(filepath)}: {e}")
+        logging.debug(f"Pillow can't read EXIF from {os.path.basename(filepath)}: {e}")
+        try:
+            date_values = _exif_dates_exifread(filepath)
+        except Exception as e:
+            logging.debug(f"Error reading EXIF from {os.path.basename(filepath)}: {e}")
+            return None
+    
+    for value in date_values:
+        if not value:
+            continue
+        try:
+            # EXIF format: "YYYY:MM:DD HH:MM:SS"
+            return datetime.strptime(str(value).strip('\x00 '), "%Y:%m:%d %H:%M:%S")
+        except ValueError:
+            continue
     
     return None
 
 
+# MP4/QuickTime timestamps count seconds from 1904-01-01 (UTC)
+MP4_EPOCH = datetime(1904, 1, 1)
+MP4_CONTAINERS = {'.mp4', '.mov', '.m4v'}
+
+
+def _find_box(data, box_type: bytes, start: int, end: int) -> Optional[Tuple[int, int]]:
+    """
+    Find a box among the sibling boxes in data[start:end]
+    
+    Args:
+        data: Buffer holding the file (bytes or mmap)
+        box_type: Four-character box type (e.g. b'moov')
+        start: Offset of the first sibling box
+        end: Offset where the siblings end
+        
+    Returns:
+        Tuple of (payload start, box end) or None if not found
+    """
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from('>I4s', data, pos)
+        header = 8
+        if size == 1:  # 64-bit size follows the type
+            if pos + 16 > end:
+                return None
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header = 16
+        elif size == 0:  # Box extends to the end of its parent
+            size = end - pos
+        if size < header:
+            return None
+        if kind == box_type:
+            return pos + header, min(pos + size, end)
+        pos += size
+    return None
+
+
+def get_mp4_creation_time(filepath: str) -> Optional[datetime]:
+    """
+    Read the creation time straight from the moov/mvhd box of an MP4/MOV file
+    
+    This is the same value ffprobe reports as the creation_time tag, without
+    launching a process. The file is memory-mapped, so only the box headers
+    and the mvhd payload are actually read, even when moov sits after a
+    multi-gigabyte mdat.
+    
+    Args:
+        filepath: Path to MP4/MOV file
+        
+    Returns:
+        datetime object (UTC) or None if the box is missing or unset
+    """
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            moov = _find_box(mm, b'moov', 0, len(mm))
+            if moov is None:
+                return None
+            mvhd = _find_box(mm, b'mvhd', *moov)
+            if mvhd is None:
+                return None
+            
+            payload = mvhd[0]
+            version = mm[payload]
+            if version == 1:
+                creation_time = struct.unpack_from('>Q', mm, payload + 4)[0]
+            else:
+                creation_time = struct.unpack_from('>I', mm, payload + 4)[0]
+    
+    # Zero means the muxer didn't set it (ffprobe omits the tag too)
+    if creation_time == 0:
+        return None
+    return MP4_EPOCH + timedelta(seconds=creation_time)
+
+
+@cached_metadata_date
 def get_video_metadata_date(filepath: str) -> Optional[datetime]:
     """
-    Extract creation date from video metadata using ffprobe
+    Extract creation date from video metadata
+    
+    MP4/MOV files are parsed directly; other containers (or MP4s that can't
+    be parsed) go through ffprobe.
     
     Args:
         filepath: Path to video file
@@ -74,6 +289,12 @@ def get_video_metadata_date(filepath: str) -> Optional[datetime]:
     Returns:
         datetime object or None if not found
     """
+    if os.path.splitext(filepath)[1].lower() in MP4_CONTAINERS:
+        try:
+            return get_mp4_creation_time(filepath)
+        except (OSError, ValueError, IndexError, struct.error) as e:
+            logging.debug(f"Falling back to ffprobe for {os.path.basename(filepath)}: {e}")
+    
     try:
         # Use ffprobe to get metadata in JSON format
         cmd = [
@@ -118,6 +339,18 @@ def get_file_modification_date(filepath: str) -> datetime:
     return datetime.fromtimestamp(timestamp)
 
 
+# Filename date patterns, compiled once (extract_date_from_filename runs per file)
+_RE_DATETIME = re.compile(r'(\d{8})_(\d{6})')
+_RE_DATE = re.compile(r'(\d{8})')
+_RE_ISO_DATE = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+
+
+def _date_from_digits(date_str: str, time_str: str = '000000') -> datetime:
+    """Build a datetime from YYYYMMDD and HHMMSS digit strings (much faster than strptime)"""
+    return datetime(int(date_str[:4]), int(date_str[4:6]), int(date_str[6:8]),
+                    int(time_str[:2]), int(time_str[2:4]), int(time_str[4:6]))
+
+
 def extract_date_from_filename(filename: str) -> Optional[datetime]:
     """
     Try to extract date and time from filename patterns like:
@@ -134,31 +367,27 @@ def extract_date_from_filename(filename: str) -> Optional[datetime]:
     Returns:
         datetime object or None if pattern not found
     """
-    import re
-    
     # Pattern 1: YYYYMMDD_HHMMSS (date with time) - try this FIRST
-    pattern_with_time = r'(\d{8})_(\d{6})'
-    match_time = re.search(pattern_with_time, filename)
+    match_time = _RE_DATETIME.search(filename)
     
     if match_time:
         date_str, time_str = match_time.groups()
         try:
             # Parse date and time together
-            parsed_date = datetime.strptime(f"{date_str}_{time_str}", "%Y%m%d_%H%M%S")
+            parsed_date = _date_from_digits(date_str, time_str)
             if 2000 <= parsed_date.year <= 2030:
                 return parsed_date
         except ValueError:
             pass
     
     # Pattern 2: YYYYMMDD anywhere in filename (8 consecutive digits)
-    pattern = r'(\d{8})'
-    match = re.search(pattern, filename)
+    match = _RE_DATE.search(filename)
     
     if match:
         date_str = match.group(1)
         try:
             # Validate it's a reasonable date
-            parsed_date = datetime.strptime(date_str, "%Y%m%d")
+            parsed_date = _date_from_digits(date_str)
             # Basic sanity check: year should be between 2000 and 2030
             if 2000 <= parsed_date.year <= 2030:
                 return parsed_date
@@ -166,8 +395,7 @@ def extract_date_from_filename(filename: str) -> Optional[datetime]:
             pass
     
     # Pattern 3: YYYY-MM-DD format
-    pattern2 = r'(\d{4})-(\d{2})-(\d{2})'
-    match2 = re.search(pattern2, filename)
+    match2 = _RE_ISO_DATE.search(filename)
     
     if match2:
         try:
@@ -273,6 +501,22 @@ def is_gif(filepath: str) -> bool:
     return os.path.splitext(filepath)[1].lower() == '.gif'
 
 
+def bucket_by_month(assignments: Dict[str, list]) -> Dict[str, Dict[str, list]]:
+    """
+    Group date-keyed assignments by month in a single pass
+    
+    Args:
+        assignments: Dict mapping YYYY-MM-DD to media lists
+        
+    Returns:
+        Dict mapping YYYY-MM to {YYYY-MM-DD: media list}, dates in order
+    """
+    by_month = {}
+    for date_key in sorted(assignments):
+        by_month.setdefault(date_key[:7], {})[date_key] = assignments[date_key]
+    return by_month
+
+
 def format_duration(seconds: float) -> str:
     """Format duration in MM:SS format"""
     mins = int(seconds // 60)
@@ -280,6 +524,121 @@ def format_duration(seconds: float) -> str:
     return f"{mins:02d}:{secs:02d}"
 
 
+def prefetch_files(paths):
+    """
+    Ask the kernel to start reading files into the page cache (Linux only)
+    
+    Args:
+        paths: Iterable of file paths; missing files are ignored
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def bulk_exists(paths, workers: int = 32) -> list:
+    """
+    Check many paths for existence concurrently
+    
+    stat() calls block on the filesystem, so issuing them from a thread pool
+    overlaps their latency (a big win on network/slow disks).
+    
+    Args:
+        paths: List of file paths
+        workers: Number of threads issuing stat calls
+        
+    Returns:
+        List of booleans, in the same order as paths
+    """
+    if len(paths) < 2:
+        return [os.path.exists(path) for path in paths]
+    
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+        return list(executor.map(os.path.exists, paths, chunksize=64))
+
+
 def ensure_dir_exists(dirpath: str):
     """Create directory if it doesn't exist"""
     os.makedirs(dirpath, exist_ok=True)
+
+
+# Hardware H.264 encoders to try, in order of preference
+HW_ENCODERS = ['h264_nvenc', 'h264_videotoolbox']
+
+
+@lru_cache(maxsize=None)
+def detect_hw_encoder() -> Optional[str]:
+    """
+    Find a hardware H.264 encoder that actually works on this machine
+    
+    An encoder being compiled into ffmpeg doesn't mean the device is present,
+    so each candidate is checked with a tiny test encode. Cached per process.
+    
+    Returns:
+        Encoder name (e.g. 'h264_nvenc') or None to use the software encoder
+    """
+    try:
+        result = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'],
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    
+    for encoder in HW_ENCODERS:
+        if encoder not in result.stdout:
+            continue
+        test = subprocess.run(
+            ['ffmpeg', '-hide_banner', '-loglevel', 'error',
+             '-f', 'lavfi', '-i', 'color=c=black:s=256x256:d=0.1',
+             '-c:v', encoder, '-f', 'null', '-'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30
+        )
+        if test.returncode == 0:
+            logging.info(f"Using hardware encoder: {encoder}")
+            return encoder
+    
+    return None
+
+
+# Hardware decoder (ffmpeg -hwaccel) that goes with each hardware encoder
+HW_DECODERS = {
+    'h264_nvenc': 'cuda',
+    'h264_videotoolbox': 'videotoolbox',
+}
+
+
+@lru_cache(maxsize=None)
+def detect_hw_decoder() -> Optional[str]:
+    """
+    Find a hardware decoder (ffmpeg -hwaccel name) usable on this machine
+    
+    Only offered when the matching hardware encoder passed its test encode,
+    so the device is known to be present. Cached per process.
+    
+    Returns:
+        hwaccel name (e.g. 'cuda') or None to decode in software
+    """
+    hwaccel = HW_DECODERS.get(detect_hw_encoder())
+    if hwaccel is None:
+        return None
+    
+    try:
+        result = subprocess.run(['ffmpeg', '-hide_banner', '-hwaccels'],
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    
+    if hwaccel in result.stdout.split():
+        logging.info(f"Using hardware decoder: {hwaccel}")
+        return hwaccel
+    return None
@@ -10,49 +10,122 @@ This script:
 Usage: python generate_recap.py
 """
 import os
-import shutil
+import hashlib
 import logging
-from utils import setup_logging
+from concurrent.futures import ThreadPoolExecutor
+from utils import setup_logging, detect_hw_encoder, detect_hw_decoder
 from config import (
-    PROCESSED_FOLDER, TEMP_FOLDER, LOG_LEVEL,
-    MEDIA_ASSIGNMENT_JSON, REPORT_VISUAL_TXT, REPORT_DETAILED_CSV
+    INPUT_FOLDER, PROCESSED_FOLDER, TEMP_FOLDER, LOG_LEVEL, VIDEO_SETTINGS, TARGET_YEAR,
+    MEDIA_ASSIGNMENT_JSON, MEDIA_ASSIGNMENT_SIG, REPORT_VISUAL_TXT, REPORT_DETAILED_CSV
 )
 
 # Import the main functions
 from assign_media import main as assign_media_main
 from generate_video import VideoGenerator
 
+def media_folder_signature() -> str:
+    """
+    Fingerprint the media folder: every file's name, size and mtime, plus the
+    target year (the other input of the assignment)
+    
+    Returns:
+        Hex digest, or an empty string if the folder can't be listed
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{TARGET_YEAR}\n".encode('utf-8'))
+    try:
+        with os.scandir(INPUT_FOLDER) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                if entry.is_file():
+                    stat = entry.stat()
+                    digest.update(f"{entry.name}|{stat.st_size}|{stat.st_mtime_ns}\n".encode('utf-8'))
+    except OSError:
+        return ''
+    return digest.hexdigest()
+
+
+def assignment_is_current(signature: str) -> bool:
+    """Check whether MEDIA_ASSIGNMENT_JSON was built from the media folder as it is now"""
+    if not signature or not os.path.exists(MEDIA_ASSIGNMENT_JSON):
+        return False
+    try:
+        with open(MEDIA_ASSIGNMENT_SIG, 'r', encoding='utf-8') as f:
+            return f.read().strip() == signature
+    except OSError:
+        return False
+
+
+def warm_up_video_generation():
+    """
+    Run the one-off hardware probes phase 2 needs (ffmpeg encoder/hwaccel listing
+    and test encodes); they are cached per process, so running them while phase 1
+    scans the media leaves phase 2 nothing to wait for
+    """
+    if VIDEO_SETTINGS.get('hw_encoder') == 'auto':
+        detect_hw_encoder()
+        if VIDEO_SETTINGS.get('hw_decode'):
+            detect_hw_decoder()
+
+
+def _fast_rmtree(path: str):
+    """
+    Delete a directory tree, unlinking its files from a thread pool
+    
+    The tree is listed with os.scandir (the entry type comes from the listing,
+    no stat per file), then the unlinks run concurrently so their metadata
+    latency overlaps, and the directories are removed bottom-up.
+    
+    Args:
+        path: Directory to delete
+    """
+    files, dirs = [], []
+    pending = [path]
+    while pending:
+        current = pending.pop()
+        dirs.append(current)  # Always listed before its subdirectories
+        with os.scandir(current) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                else:
+                    files.append(entry.path)
+    
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        list(executor.map(os.unlink, files))
+    for directory in reversed(dirs):
+        os.rmdir(directory)
+
+
 def cleanup_temp_files():
     """Remove temporary files and folders after video generation"""
     logging.info("\n" + "="*60)
     logging.info("CLEANING UP TEMPORARY FILES")
     logging.info("="*60)
     
-    # Remove processed folder
-    if os.path.exists(PROCESSED_FOLDER):
-        try:
-            shutil.rmtree(PROCESSED_FOLDER)
-            logging.info(f"✓ Removed: {PROCESSED_FOLDER}")
-        except Exception as e:
-            logging.warning(f"Could not remove {PROCESSED_FOLDER}: {e}")
-    
-    # Remove temp folder
-    if os.path.exists(TEMP_FOLDER):
+    # Remove processed and temp folders (a missing folder is simply skipped)
+    for folder in (PROCESSED_FOLDER, TEMP_FOLDER):
         try:
-            shutil.rmtree(TEMP_FOLDER)
-            logging.info(f"✓ Removed: {TEMP_FOLDER}")
+            _fast_rmtree(folder)
+            logging.info(f"✓ Removed: {folder}")
+        except FileNotFoundError:
+            pass
         except Exception as e:
-            logging.warning(f"Could not remove {TEMP_FOLDER}: {e}")
+            logging.warning(f"Could not remove {folder}: {e}")
     
-    # Remove test files
-    for pattern in ['*TEST*.mp4', '*_january.json', '*_july.json']:
-        import glob
-        for file in glob.glob(pattern):
+    # Remove test files (*TEST*.mp4, *_january.json, *_july.json) in one directory pass
+    with os.scandir('.') as entries:
+        for entry in entries:
+            name = entry.name
+            if name.startswith('.') or not entry.is_file():
+                continue
+            if not (('TEST' in name and name.endswith('.mp4'))
+                    or name.endswith('_january.json') or name.endswith('_july.json')):
+                continue
             try:
-                os.remove(file)
-                logging.info(f"✓ Removed: {file}")
+                os.remove(entry.path)
+                logging.info(f"✓ Removed: {name}")
             except Exception as e:
-                logging.warning(f"Could not remove {file}: {e}")
+                logging.warning(f"Could not remove {name}: {e}")
     
     logging.info("\nTemporary files cleaned up successfully!")
 
@@ -61,21 +134,37 @@ def main():
     """Main execution - Complete video generation workflow"""
     setup_logging(LOG_LEVEL)
     
-    print("\n" + "="*70)
-    print("           YEAR IN 365 SECONDS - 2025 RECAP")
-    print("="*70)
-    print()
+    # Each banner is written with one print call (one console write)
+    print("\n" + "="*70 + "\n"
+          "           YEAR IN 365 SECONDS - 2025 RECAP\n"
+          + "="*70 + "\n")
     
     try:
         # PHASE 1: Scan and assign media to days
-        print("PHASE 1: Scanning media and assigning to days...")
-        print("-" * 70)
-        assign_media_main()
+        print("PHASE 1: Scanning media and assigning to days...\n" + "-" * 70)
+        signature = media_folder_signature()
+        if assignment_is_current(signature):
+            print("PHASE 1: cached, skipping (media folder unchanged since the last assignment)")
+            warm_up_video_generation()
+        else:
+            previous_mtime = os.path.getmtime(MEDIA_ASSIGNMENT_JSON) if os.path.exists(MEDIA_ASSIGNMENT_JSON) else None
+            
+            # Phase 2's setup only launches ffmpeg probes: overlap it with the scan
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                warm_up = executor.submit(warm_up_video_generation)
+                assign_media_main()
+                warm_up.result()
+            
+            # Record the fingerprint only if this run actually wrote the assignment
+            if (signature and os.path.exists(MEDIA_ASSIGNMENT_JSON)
+                    and os.path.getmtime(MEDIA_ASSIGNMENT_JSON) != previous_mtime):
+                with open(MEDIA_ASSIGNMENT_SIG, 'w', encoding='utf-8') as f:
+                    f.write(signature)
         
         # PHASE 2: Generate video
-        print("\n" + "="*70)
-        print("PHASE 2: Generating video with effects...")
-        print("-" * 70)
+        print("\n" + "="*70 + "\n"
+              "PHASE 2: Generating video with effects...\n"
+              + "-" * 70)
         generator = VideoGenerator()
         generator.generate()
         
@@ -83,26 +172,26 @@ def main():
         cleanup_temp_files()
         
         # Final summary
-        print("\n" + "="*70)
-        print("           ✨ VIDEO GENERATION COMPLETE ✨")
-        print("="*70)
-        print()
-        print("📁 Output files:")
-        print(f"   🎬 Video: 2025_recap.mp4")
-        print(f"   📊 Visual report: {os.path.basename(REPORT_VISUAL_TXT)}")
-        print(f"   📄 Detailed CSV: {os.path.basename(REPORT_DETAILED_CSV)}")
-        print()
-        print("🎉 ¡Tu video del 2025 está listo!")
-        print("="*70)
+        print("\n" + "="*70 + "\n"
+              "           ✨ VIDEO GENERATION COMPLETE ✨\n"
+              + "="*70 + "\n"
+              "\n"
+              "📁 Output files:\n"
+              "   🎬 Video: 2025_recap.mp4\n"
+              f"   📊 Visual report: {os.path.basename(REPORT_VISUAL_TXT)}\n"
+              f"   📄 Detailed CSV: {os.path.basename(REPORT_DETAILED_CSV)}\n"
+              "\n"
+              "🎉 ¡Tu video del 2025 está listo!\n"
+              + "="*70)
         
     except KeyboardInterrupt:
-        print("\n\n⚠️  Process interrupted by user")
-        print("Temporary files were not cleaned up")
-        print("Run cleanup manually if needed")
+        print("\n\n⚠️  Process interrupted by user\n"
+              "Temporary files were not cleaned up\n"
+              "Run cleanup manually if needed")
     except Exception as e:
         logging.error(f"\n❌ Error during video generation: {e}")
-        print("\n⚠️  Video generation failed")
-        print("Check the error messages above for details")
+        print("\n⚠️  Video generation failed\n"
+              "Check the error messages above for details")
         raise
 
 
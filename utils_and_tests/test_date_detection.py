@@ -1,29 +1,38 @@
 """
 Test script for enhanced date detection
+
+Runs standalone (prints every result) or under pytest (asserts the expected dates)
 """
 from utils import extract_date_from_filename
 from datetime import datetime
 
-# Test cases for filename date extraction
-test_filenames = [
-    "IMG_20251212.jpg",
-    "IMG-20250105-WA0010.jpg",
-    "Screenshot_20250323_181709_AppSheet.jpg",
-    "VID_20250401.mp4",
-    "20250102_161334.jpg",
-    "2025-03-14_photo.jpg",
-    "vacation.jpg",  # No date
-    "photo_19951231.jpg",  # Old date
-]
+# Test cases for filename date extraction (filename -> expected date)
+test_filenames = {
+    "IMG_20251212.jpg": datetime(2025, 12, 12),
+    "IMG-20250105-WA0010.jpg": datetime(2025, 1, 5),
+    "Screenshot_20250323_181709_AppSheet.jpg": datetime(2025, 3, 23, 18, 17, 9),
+    "VID_20250401.mp4": datetime(2025, 4, 1),
+    "20250102_161334.jpg": datetime(2025, 1, 2, 16, 13, 34),
+    "2025-03-14_photo.jpg": datetime(2025, 3, 14),
+    "vacation.jpg": None,  # No date
+    "photo_19951231.jpg": None,  # Old date
+}
+
 
-print("FILENAME DATE EXTRACTION TESTS")
-print("=" * 60)
+def test_filename_dates():
+    for filename, expected in test_filenames.items():
+        assert extract_date_from_filename(filename) == expected, filename
 
-for filename in test_filenames:
-    date = extract_date_from_filename(filename)
-    if date:
-        print(f"OK  {filename:45} => {date.strftime('%Y-%m-%d')}")
-    else:
-        print(f"NO  {filename:45} => No date found")
 
-print("\nTests completed!")
+if __name__ == "__main__":
+    print("FILENAME DATE EXTRACTION TESTS")
+    print("=" * 60)
+    
+    for filename in test_filenames:
+        date = extract_date_from_filename(filename)
+        if date:
+            print(f"OK  {filename:45} => {date.strftime('%Y-%m-%d')}")
+        else:
+            print(f"NO  {filename:45} => No date found")
+    
+    print("\nTests completed!")
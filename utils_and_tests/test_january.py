@@ -2,61 +2,41 @@
 Test script: Generate video only for January 2025
 """
 import os
-import json
 from generate_video import VideoGenerator
 from config import MEDIA_ASSIGNMENT_JSON, OUTPUT_FOLDER
 import logging
-from utils import setup_logging
+from utils import setup_logging, json_dumps, json_loads, bucket_by_month
 
 setup_logging("INFO")
 
 # Load all assignments
 logging.info("Loading media assignments...")
-with open(MEDIA_ASSIGNMENT_JSON, 'r', encoding='utf-8') as f:
-    all_assignments = json.load(f)
+with open(MEDIA_ASSIGNMENT_JSON, 'rb') as f:
+    all_assignments = json_loads(f.read())
 
 # Filter only January dates
-january_assignments = {}
-for date_key in sorted(all_assignments.keys()):
-    if date_key.startswith('2025-01'):
-        january_assignments[date_key] = all_assignments[date_key]
+january_assignments = bucket_by_month(all_assignments).get('2025-01', {})
 
 logging.info(f"Found {len(january_assignments)} days in January with media")
 total_files = sum(len(media_list) for media_list in january_assignments.values())
 logging.info(f"Total files for January: {total_files}")
 
-# Save temporary test assignment
-test_file = 'media_assignment_january.json'
-with open(test_file, 'w', encoding='utf-8') as f:
-    json.dump(january_assignments, f, indent=2)
+# The assignments are passed to the generator in memory; write them out
+# only when asked to (DUMP_TEST_JSON=1), for inspection
+if os.environ.get('DUMP_TEST_JSON'):
+    test_file = 'media_assignment_january.json'
+    with open(test_file, 'wb') as f:
+        f.write(json_dumps(january_assignments, indent=True))
+    logging.info(f"Created test assignment: {test_file}")
 
-logging.info(f"Created test assignment: {test_file}")
-
-# Temporarily modify the generator to use test file
-class JanuaryVideoGenerator(VideoGenerator):
-    def load_assignments(self):
-        with open(test_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+# Generate video (the filtered assignments and the output path go straight to generate())
+from config import FINAL_VIDEO
+test_output = FINAL_VIDEO.replace('2025_recap.mp4', '2025_recap_JANUARY_TEST.mp4')
 
-# Generate video
 logging.info("\nStarting video generation for January only...")
-generator = JanuaryVideoGenerator()
+generator = VideoGenerator()
+generator.generate(assignments=january_assignments, out_path=test_output)
 
-# Override output filename
-from config import FINAL_VIDEO
-test_output = FINAL_VIDEO.replace('2025_recap.mp4', '2025_recap_JANUARY_TEST.mp4')
-original_final_video = FINAL_VIDEO
-
-# Patch the config temporarily
-import config
-config.FINAL_VIDEO = test_output
-
-try:
-    generator.generate()
-finally:
-    # Restore
-    config.FINAL_VIDEO = original_final_video
-    
 logging.info(f"\n{'='*60}")
 logging.info(f"TEST VIDEO COMPLETE: {test_output}")
 logging.info(f"{'='*60}")